@@ -0,0 +1,307 @@
+"""Log handlers that write from a background thread in batches.
+
+ReFrame formats and writes every log record in its main loop, a write and a
+flush per record of the debug log and an open, write and close per
+performance variable of the filelog perflog. With many concurrent tests
+this I/O takes a good part of the frontend's time on the login node.
+
+The handlers of this module format a record when it is logged, since the
+record refers to the test that keeps changing, converting only the fields
+of the format, and queue the formatted lines. A background thread writes
+the lines queued for a file with a single write, every flush_interval
+seconds or as soon as capacity lines are queued. The lines of the last
+interval are lost if ReFrame is killed, they are written when it exits
+otherwise.
+
+Importing the module registers two handler types for the configuration:
+
+  buffered_file  the file handler, buffered (name, append)
+  jsonlines      a perflog with a JSON object per line for every
+                 performance variable, written to
+                 <basedir>/<prefix>/<test>.jsonl (basedir, prefix)
+
+Both accept capacity (lines, default 1000) and flush_interval (seconds,
+default 1).
+"""
+
+import json
+import logging
+import os
+import re
+import sys
+import threading
+
+import reframe.utility.jsonext as jsonext
+import reframe.utility.osext as osext
+from reframe.core.logging import RFC3339Formatter, register_log_handler
+
+DEFAULT_CAPACITY = 1000
+DEFAULT_FLUSH_INTERVAL = 1.0
+
+
+class BatchWriter:
+    """Write queued lines to their files from a background thread."""
+
+    def __init__(
+        self, capacity=DEFAULT_CAPACITY, flush_interval=DEFAULT_FLUSH_INTERVAL
+    ):
+        self.capacity = capacity
+        self.flush_interval = flush_interval
+        self._pending = []
+        self._pending_cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._streams = {}
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._write_loop, name="BatchWriter", daemon=True
+        )
+        self._thread.start()
+
+    def truncate(self, path):
+        with self._write_lock:
+            self._streams[path] = open(path, "w", encoding="utf-8")
+
+    def enqueue(self, path, line):
+        with self._pending_cond:
+            self._pending.append((path, line))
+            if len(self._pending) >= self.capacity:
+                self._pending_cond.notify()
+
+    def _write_loop(self):
+        while True:
+            with self._pending_cond:
+                self._pending_cond.wait_for(
+                    lambda: self._closed or len(self._pending) >= self.capacity,
+                    timeout=self.flush_interval,
+                )
+                closed = self._closed
+
+            self.flush()
+            if closed:
+                return
+
+    def flush(self):
+        with self._write_lock:
+            with self._pending_cond:
+                batch, self._pending = self._pending, []
+
+            # Keep the order of the lines of every file
+            lines = {}
+            for path, line in batch:
+                lines.setdefault(path, []).append(line)
+
+            for path, file_lines in lines.items():
+                try:
+                    stream = self._streams.get(path)
+                    if stream is None:
+                        os.makedirs(os.path.dirname(path), exist_ok=True)
+                        stream = open(path, "a", encoding="utf-8")
+                        self._streams[path] = stream
+
+                    stream.write("".join(file_lines))
+                    stream.flush()
+                except OSError as err:
+                    sys.stderr.write(f"could not write the log {path}: {err}\n")
+
+    def close(self):
+        with self._pending_cond:
+            if self._closed:
+                return
+
+            self._closed = True
+            self._pending_cond.notify()
+
+        self._thread.join()
+        with self._write_lock:
+            for stream in self._streams.values():
+                stream.close()
+
+            self._streams = {}
+
+
+class FieldFormatter(RFC3339Formatter):
+    """ReFrame's formatter that converts only the fields of its format.
+
+    ReFrame's formatter converts every check field of a record, some 50 of
+    them mostly with a JSON encoding, for a format that uses a few.
+    """
+
+    def __init__(self, fmt, datefmt=None):
+        super().__init__(fmt=fmt, datefmt=datefmt)
+        self.fields = re.findall(r"%\((\w+)\)s", fmt)
+
+    @classmethod
+    def supports(cls, fmt):
+        return bool(fmt) and "check_#ALL" not in fmt and "check_perfvalues" not in fmt
+
+    def convert(self, field, record):
+        value = getattr(record, field, None)
+        if field == "check_job_completion_time":
+            completion_time = getattr(record, "check_job_completion_time_unix", None)
+            if completion_time is not None:
+                return self.formatTime(
+                    logging.makeLogRecord({"created": completion_time}),
+                    self.datefmt or self.default_time_format,
+                )
+
+        if not field.startswith("check_") or isinstance(value, str):
+            return value
+
+        if isinstance(value, (list, tuple, set)):
+            return ",".join(
+                v if isinstance(v, str) else jsonext.dumps(v) for v in value
+            )
+
+        return jsonext.dumps(value)
+
+    def formatMessage(self, record):
+        return self._fmt % {field: self.convert(field, record) for field in self.fields}
+
+
+class BufferedFileHandler(logging.FileHandler):
+    """The file handler of ReFrame, writing in batches.
+
+    It is a FileHandler that never opens its stream, so that ReFrame still
+    reports and saves its file.
+    """
+
+    def __init__(self, filename, append=False, **kwargs):
+        super().__init__(filename, delay=True)
+        self.writer = BatchWriter(**kwargs)
+        if not append:
+            self.writer.truncate(self.baseFilename)
+
+    def setFormatter(self, fmt):
+        # ReFrame sets its formatter after creating the handler
+        if FieldFormatter.supports(fmt._fmt):
+            fmt = FieldFormatter(fmt._fmt, fmt.datefmt)
+
+        super().setFormatter(fmt)
+
+    def emit(self, record):
+        try:
+            self.writer.enqueue(self.baseFilename, self.format(record) + "\n")
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        self.writer.flush()
+
+    def close(self):
+        self.writer.close()
+        super().close()
+
+
+class JsonLinesHandler(logging.Handler):
+    """A perflog of a JSON object per performance variable.
+
+    The keys of an object are the columns of tools/perflog/perflog_db.py,
+    params maps the name of a test parameter to its formatted value.
+    """
+
+    def __init__(self, prefix, **kwargs):
+        super().__init__()
+        self.prefix = prefix
+        self.writer = BatchWriter(**kwargs)
+
+    def perf_records(self, record):
+        check = record.__rfm_check__
+        params = {
+            name: param.format(getattr(check, name, None))
+            for name, param in getattr(type(check), "raw_params", {}).items()
+        }
+        common = {
+            "time": record.check_job_completion_time_unix or record.created,
+            "check_name": type(check).__name__,
+            "params": params,
+            "hashcode": getattr(record, "check_hashcode", None),
+            "system": getattr(record, "check_system", None),
+            "partition": getattr(record, "check_partition", None),
+            "environ": getattr(record, "check_environ", None),
+            "jobid": getattr(record, "check_jobid", None),
+            "num_tasks": getattr(record, "check_num_tasks", None),
+        }
+        if record.check_perf_var is not None:
+            # One record per performance variable (perflog_compat)
+            perfvalues = {
+                record.check_perf_var: (
+                    record.check_perf_value,
+                    record.check_perf_ref,
+                    record.check_perf_lower_thres,
+                    record.check_perf_upper_thres,
+                    record.check_perf_unit,
+                    getattr(record, "check_perf_result", None),
+                )
+            }
+        else:
+            perfvalues = getattr(record, "check_perfvalues", None) or {}
+
+        for var, (value, ref, lower, upper, unit, result) in perfvalues.items():
+            yield {
+                **common,
+                "perf_var": var.split(":")[-1],
+                "value": value,
+                "ref": ref,
+                "lower": lower,
+                "upper": upper,
+                "unit": unit,
+                "result": result,
+                "reframe_version": record.version,
+            }
+
+    def emit(self, record):
+        if getattr(record, "__rfm_check__", None) is None:
+            return
+
+        try:
+            dirname = self.prefix % record.__dict__
+            path = os.path.join(
+                dirname, f"{type(record.__rfm_check__).variant_name()}.jsonl"
+            )
+            for perf_record in self.perf_records(record):
+                self.writer.enqueue(path, json.dumps(perf_record, default=str) + "\n")
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        self.writer.flush()
+
+    def close(self):
+        self.writer.close()
+        super().close()
+
+
+def _buffering_options(site_config, config_prefix):
+    return {
+        "capacity": site_config.get(f"{config_prefix}/capacity", DEFAULT_CAPACITY),
+        "flush_interval": site_config.get(
+            f"{config_prefix}/flush_interval", DEFAULT_FLUSH_INTERVAL
+        ),
+    }
+
+
+@register_log_handler("buffered_file")
+def _create_buffered_file_handler(site_config, config_prefix):
+    filename = osext.expandvars(site_config.get(f"{config_prefix}/name"))
+    if not filename:
+        filename = osext.mkstemp_path(suffix=".log", prefix="rfm-")
+
+    return BufferedFileHandler(
+        filename,
+        append=site_config.get(f"{config_prefix}/append", False),
+        **_buffering_options(site_config, config_prefix),
+    )
+
+
+@register_log_handler("jsonlines")
+def _create_jsonlines_handler(site_config, config_prefix):
+    basedir = os.path.abspath(
+        os.path.join(
+            site_config.get("systems/0/prefix"),
+            osext.expandvars(site_config.get(f"{config_prefix}/basedir", "perflogs")),
+        )
+    )
+    prefix = osext.expandvars(site_config.get(f"{config_prefix}/prefix", ""))
+    return JsonLinesHandler(
+        os.path.join(basedir, prefix), **_buffering_options(site_config, config_prefix)
+    )
@@ -1,3 +1,32 @@
+import json
+import os
+import sys
+
+# Registers the buffered_file and jsonlines log handlers
+sys.path.append(os.path.dirname(__file__))
+import buffered_logging  # noqa: E402,F401
+
+
+def topology(system, partition):
+    """Return the processor info and the SIMD width of the nodes of a
+    partition as recorded by tools/topology/probe_topology.py, nothing if
+    they were not probed."""
+
+    path = os.path.join(
+        os.path.dirname(__file__), "topology", f"{system}-{partition}.json"
+    )
+    if not os.path.exists(path):
+        return {}
+
+    with open(path) as fp:
+        probed = json.load(fp)
+
+    return {
+        "processor": probed["processor"],
+        "extras": {"simd_width": probed["simd_width"]},
+    }
+
+
 site_configuration = {
     "systems": [
         {
@@ -22,6 +51,7 @@ site_configuration = {
                 },
                 {
                     "name": "cpu",
+                    **topology("cyclone", "cpu"),
                     "descr": "CPU-only nodes (Intel)",
                     "scheduler": "slurm",
                     "launcher": "srun",
@@ -39,8 +69,26 @@ site_configuration = {
                     ],
                     "max_jobs": 64,
                 },
+                {
+                    # Run ReFrame inside an allocation of the cpu partition,
+                    # e.g. salloc -N 2 ... reframe ..., and the tests run as
+                    # concurrent job steps of it (see tests/mixins/packing.py)
+                    "name": "cpu-packed",
+                    **topology("cyclone", "cpu"),
+                    "descr": "Job steps in the current allocation of CPU-only nodes",
+                    "scheduler": "local",
+                    "launcher": "srun",
+                    "environs": [
+                        "PrgEnv-gnu-nompi-nocuda",
+                        "PrgEnv-gnu-nocuda",
+                        "PrgEnv-intel-nompi",
+                        "PrgEnv-intel",
+                    ],
+                    "max_jobs": 40,
+                },
                 {
                     "name": "gpu",
+                    **topology("cyclone", "gpu"),
                     "descr": "Hybrid nodes (V100/Intel)",
                     "scheduler": "slurm",
                     "launcher": "srun",
@@ -123,7 +171,7 @@ site_configuration = {
             "perflog_compat": True,
             "handlers": [
                 {
-                    "type": "file",
+                    "type": "buffered_file",
                     "name": "reframe.log",
                     "level": "debug2",
                     "format": "[%(asctime)s] %(levelname)s: %(check_info)s: %(message)s",  # noqa: E501
@@ -136,7 +184,7 @@ site_configuration = {
                     "format": "%(message)s",
                 },
                 {
-                    "type": "file",
+                    "type": "buffered_file",
                     "name": "reframe.out",
                     "level": "info",
                     "format": "%(message)s",
@@ -152,6 +200,14 @@ site_configuration = {
                     "datefmt": "%FT%T%:z",
                     "append": True,
                 },
+                {
+                    # The same records as one JSON object per performance
+                    # variable, see config/buffered_logging.py and
+                    # tools/perflog
+                    "type": "jsonlines",
+                    "prefix": "%(check_system)s/%(check_partition)s",
+                    "level": "info",
+                },
             ],
         }
     ],
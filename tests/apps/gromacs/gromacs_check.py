@@ -1,9 +1,14 @@
 import itertools
 import os
+import sys
 
 import reframe as rfm
 import reframe.utility.sanity as sn
 
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "..", "mixins"))
+from calibrated_reference import CalibratedReferenceMixin  # noqa: E402
+from topology import TopologyMixin  # noqa: E402
+
 
 class GromacsBaseCheck(rfm.RunOnlyRegressionTest):
     def __init__(self, output_file):
@@ -48,15 +53,8 @@ class GromacsBaseCheck(rfm.RunOnlyRegressionTest):
 
 
 @rfm.simple_test
-class GromacsCPUCheck(GromacsBaseCheck):
+class GromacsCPUCheck(GromacsBaseCheck, CalibratedReferenceMixin, TopologyMixin):
     valid_systems = ["cyclone:cpu"]
-    # Number of cores for each system
-    cores = variable(
-        dict,
-        value={
-            "cyclone:cpu": 40,
-        },
-    )
     exclusive_access = True
 
     def __init__(self):
@@ -73,7 +71,7 @@ class GromacsCPUCheck(GromacsBaseCheck):
 
     @run_before("run")
     def setup_resources(self):
-        self.num_tasks_per_node = self.cores.get(self.current_partition.fullname, 1)
+        self.num_tasks_per_node = self.num_cores_per_node
         self.num_tasks = self.num_tasks_per_node * self.num_nodes
         self.num_cpus_per_task = 1
         self.time_limit = "1h"
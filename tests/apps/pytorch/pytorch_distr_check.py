@@ -1,9 +1,25 @@
+import glob
+import json
+import os
+import sys
+
 import reframe as rfm
 import reframe.utility.sanity as sn
 
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "..", "mixins"))
+from topology import TopologyMixin  # noqa: E402
 
-@rfm.simple_test
-class pytorch_distr_cnn(rfm.RunOnlyRegressionTest):
+
+def load_step_times(stagedir):
+    """Return the per-rank step time statistics of cnn_distr.py by rank."""
+    step_times = []
+    for filename in glob.glob(os.path.join(stagedir, "step_times.*.json")):
+        with open(filename) as fp:
+            step_times.append(json.load(fp))
+    return sorted(step_times, key=lambda rank_times: rank_times["rank"])
+
+
+class PytorchDistrCnnBase(rfm.RunOnlyRegressionTest):
     descr = "Check the training throughput of a cnn with torch.distributed"
     valid_systems = ["cyclone:gpu"]
     valid_prog_environs = ["PrgEnv-gnu"]
@@ -14,25 +30,47 @@ class pytorch_distr_cnn(rfm.RunOnlyRegressionTest):
     num_tasks_per_node = 4
     num_nodes = num_tasks // num_tasks_per_node
     num_gpus_per_node = num_tasks_per_node
+    model_name = variable(str, value="resnet50")
     throughput_per_gpu = 309.61
     executable = "python cnn_distr.py"
-    throughput_total = throughput_per_gpu * num_tasks
-
-    reference = {
-        "cyclone:gpu": {
-            "samples_per_sec_per_gpu": (throughput_per_gpu, -0.1, None, "samples/sec"),
-            "samples_per_sec_total": (throughput_total, -0.1, None, "samples/sec"),
-        }
-    }
 
     modules = ["torchvision/0.13.1-foss-2022a-CUDA-11.7.0"]
+    # The PyTorch version of the torchvision module
+    torch_version = (1, 12)
 
     maintainers = ["cstyl"]
     tags = {"applications", "performance"}
 
+    @run_after("init")
+    def set_model(self):
+        self.executable_opts += [f"--model={self.model_name}"]
+
+    @run_after("setup")
+    def set_reference(self):
+        throughput_total = self.throughput_per_gpu * self.num_tasks
+        self.reference = {
+            "cyclone:gpu": {
+                "samples_per_sec_per_gpu": (
+                    self.throughput_per_gpu,
+                    -0.1,
+                    None,
+                    "samples/sec",
+                ),
+                "samples_per_sec_total": (throughput_total, -0.1, None, "samples/sec"),
+            }
+        }
+
     @sanity_function
     def assert_job_is_complete(self):
-        return sn.assert_found(r"Total average", self.stdout)
+        return sn.all(
+            [
+                sn.assert_found(r"Total average", self.stdout),
+                sn.assert_eq(
+                    sn.count(sn.glob(os.path.join(self.stagedir, "step_times.*.json"))),
+                    self.num_tasks,
+                ),
+            ]
+        )
 
     @performance_function("samples/sec")
     def samples_per_sec_per_gpu(self):
@@ -45,6 +83,28 @@ class pytorch_distr_cnn(rfm.RunOnlyRegressionTest):
             )
         )
 
+    @performance_function("s")
+    def data_time_per_epoch(self):
+        return sn.avg(
+            sn.extractall(
+                r"Epoch\s+\d+\:.*\(data (?P<data_time>\S+) s,",
+                self.stdout,
+                "data_time",
+                float,
+            )
+        )
+
+    @performance_function("s")
+    def compute_time_per_epoch(self):
+        return sn.avg(
+            sn.extractall(
+                r"Epoch\s+\d+\:.*compute (?P<compute_time>\S+) s\)",
+                self.stdout,
+                "compute_time",
+                float,
+            )
+        )
+
     @performance_function("samples/sec")
     def samples_per_sec_total(self):
         return sn.avg(
@@ -56,13 +116,346 @@ class pytorch_distr_cnn(rfm.RunOnlyRegressionTest):
             )
         )
 
+    def worst_rank_time(self, phase, stat):
+        """The largest step time statistic of a phase over all ranks."""
+        return max(
+            rank_times["stats"][phase][stat]
+            for rank_times in load_step_times(self.stagedir)
+        )
+
+    @performance_function("s")
+    def step_time_p50(self):
+        return self.worst_rank_time("step", "p50")
+
+    @performance_function("s")
+    def step_time_p95(self):
+        return self.worst_rank_time("step", "p95")
+
+    @performance_function("s")
+    def step_time_max(self):
+        return self.worst_rank_time("step", "max")
+
+    @performance_function("s")
+    def data_time_p95(self):
+        return self.worst_rank_time("data", "p95")
+
+    @performance_function("s")
+    def forward_time_p95(self):
+        return self.worst_rank_time("forward", "p95")
+
+    @performance_function("s")
+    def backward_time_p95(self):
+        return self.worst_rank_time("backward", "p95")
+
+    @performance_function("s")
+    def optimizer_time_p95(self):
+        return self.worst_rank_time("optimizer", "p95")
+
+    @performance_function("rank")
+    def slowest_rank(self):
+        step_times = load_step_times(self.stagedir)
+        slowest = max(
+            step_times, key=lambda rank_times: rank_times["stats"]["step"]["p50"]
+        )
+        return slowest["rank"]
+
+    @performance_function("x")
+    def slowest_rank_slowdown(self):
+        """Median step time of the slowest rank over that of all ranks."""
+        step_p50 = sorted(
+            rank_times["stats"]["step"]["p50"]
+            for rank_times in load_step_times(self.stagedir)
+        )
+        return step_p50[-1] / step_p50[len(step_p50) // 2]
+
+    @performance_function("s")
+    def allreduce_time_per_step(self):
+        """Allreduce time the backward does not hide, on the worst rank."""
+        return max(
+            rank_times["allreduce_time"]
+            for rank_times in load_step_times(self.stagedir)
+        )
+
     @run_before("run")
     def set_visible_devices_per_rank(self):
-        self.job.launcher.options.append("./set_visible_devices.sh")
+        if self.num_gpus_per_node:
+            self.job.launcher.options.append("./set_visible_devices.sh")
 
     @run_before("run")
     def set_job_options(self):
-        self.job.options = [
-            f"--nodes={self.num_nodes}",
-            f"--gres=gpu:{self.num_gpus_per_node}",
+        self.job.options = [f"--nodes={self.num_nodes}"]
+        if self.num_gpus_per_node:
+            self.job.options += [f"--gres=gpu:{self.num_gpus_per_node}"]
+
+
+@rfm.simple_test
+class pytorch_distr_cnn(PytorchDistrCnnBase):
+    # flat: DDP's allreduce over all ranks
+    # hierarchical: reduce within each node, then allreduce across nodes
+    allreduce_mode = parameter(["flat", "hierarchical"])
+    # dataset: generate every sample on the main process
+    # pinned: reuse one pre-allocated pinned batch, copied every step
+    # device: reuse one batch resident on the GPU
+    # workers: generate the samples with loader processes
+    data_mode = parameter(["dataset", "pinned", "device", "workers"])
+    data_workers = 4
+
+    @run_after("init")
+    def set_allreduce_mode(self):
+        self.executable_opts += [f"--allreduce={self.allreduce_mode}"]
+
+    @run_after("init")
+    def set_data_mode(self):
+        self.executable_opts += [f"--data={self.data_mode}"]
+        if self.data_mode == "workers":
+            # One core for the training process and one per loader process
+            self.num_cpus_per_task = self.data_workers + 1
+            self.executable_opts += [f"--data-workers={self.data_workers}"]
+
+
+@rfm.simple_test
+class pytorch_distr_cnn_train_mode(PytorchDistrCnnBase):
+    descr = "Check the training throughput of a cnn in the common training modes"
+    # fp32: eager FP32 training in the NCHW layout, the baseline
+    # amp_fp16/amp_bf16: automatic mixed precision, fp16 with a grad scaler
+    # channels_last: FP32 training in the NHWC layout
+    # compile: FP32 training of the model compiled with torch.compile
+    train_mode = parameter(["fp32", "amp_fp16", "amp_bf16", "channels_last", "compile"])
+    train_mode_opts = {
+        "fp32": [],
+        "amp_fp16": ["--precision=fp16"],
+        "amp_bf16": ["--precision=bf16"],
+        "channels_last": ["--channels-last"],
+        "compile": ["--compile"],
+    }
+    # The V100 has no bf16 tensor cores, so amp_bf16 is expected near fp32.
+    # The modes without a measured throughput have no reference.
+    train_mode_throughput_per_gpu = {
+        "fp32": 309.61,
+        "amp_bf16": 309.61,
+        "channels_last": 309.61,
+    }
+
+    @run_after("init")
+    def set_train_mode(self):
+        self.skip_if(
+            self.train_mode == "compile" and self.torch_version < (2, 0),
+            "torch.compile needs PyTorch 2.0 or newer",
+        )
+        self.executable_opts += self.train_mode_opts[self.train_mode]
+        self.throughput_per_gpu = self.train_mode_throughput_per_gpu.get(
+            self.train_mode
+        )
+
+    @run_after("setup")
+    def set_reference(self):
+        if self.throughput_per_gpu is None:
+            self.reference = {}
+        else:
+            super().set_reference()
+
+
+@rfm.simple_test
+class pytorch_distr_cnn_ddp(PytorchDistrCnnBase):
+    descr = "Check the training throughput of a cnn with tuned DDP communication"
+    # Every setting changes one option of DistributedDataParallel:
+    # bucket_*mb: the size of the gradient buckets, 25 MiB by default
+    # bucket_view: gradient_as_bucket_view, no copies between grads and buckets
+    # static_graph: static_graph, the graph and the used parameters never change
+    # fp16/bf16_compress: allreduce the gradients compressed to fp16/bf16
+    # powersgd: allreduce a rank 1 PowerSGD approximation of the gradients
+    ddp_setting = parameter(
+        [
+            "default",
+            "bucket_5mb",
+            "bucket_100mb",
+            "bucket_view",
+            "static_graph",
+            "fp16_compress",
+            "bf16_compress",
+            "powersgd",
+        ]
+    )
+    ddp_setting_opts = {
+        "default": [],
+        "bucket_5mb": ["--bucket-cap-mb=5"],
+        "bucket_100mb": ["--bucket-cap-mb=100"],
+        "bucket_view": ["--gradient-as-bucket-view"],
+        "static_graph": ["--static-graph"],
+        "fp16_compress": ["--comm-hook=fp16"],
+        "bf16_compress": ["--comm-hook=bf16"],
+        "powersgd": ["--comm-hook=powersgd"],
+    }
+
+    @run_after("init")
+    def set_ddp_setting(self):
+        self.executable_opts += self.ddp_setting_opts[self.ddp_setting]
+
+
+@rfm.simple_test
+class pytorch_distr_cnn_scaling(PytorchDistrCnnBase):
+    descr = "Check the scaling of the training throughput of a cnn over the nodes"
+    scaling_nodes = parameter([1, 2, 4, 8])
+    # weak: the batch size per GPU stays fixed
+    # strong: the global batch size stays that of the single-node run
+    scaling_mode = parameter(["weak", "strong"])
+    batch_size_per_gpu = 256
+
+    @run_after("init")
+    def set_scaling(self):
+        self.num_nodes = self.scaling_nodes
+        self.num_tasks = self.num_tasks_per_node * self.num_nodes
+        if self.scaling_mode == "strong":
+            global_batch_size = self.batch_size_per_gpu * self.num_tasks_per_node
+            self.executable_opts += [f"--global-batch-size={global_batch_size}"]
+        else:
+            self.executable_opts += [f"--batch-size={self.batch_size_per_gpu}"]
+
+    @run_after("init")
+    def set_dependencies(self):
+        if self.scaling_nodes > 1:
+            self.depends_on(self.single_node_variant())
+
+    @run_after("setup")
+    def set_efficiency_reference(self):
+        if self.scaling_mode == "weak":
+            self.reference["cyclone:gpu:parallel_efficiency"] = (
+                100.0,
+                -0.2,
+                None,
+                "%",
+            )
+        else:
+            # The batch per GPU shrinks with the nodes, so the per-GPU
+            # throughput has no reference and the efficiency drops faster
+            self.reference = {
+                "cyclone:gpu": {"parallel_efficiency": (100.0, -0.4, None, "%")}
+            }
+
+    def single_node_variant(self):
+        cls = type(self)
+        (variant_num,) = cls.get_variant_nums(
+            scaling_nodes=lambda nodes: nodes == 1,
+            scaling_mode=lambda mode: mode == self.scaling_mode,
+        )
+        return cls.variant_name(variant_num)
+
+    @performance_function("%")
+    def parallel_efficiency(self):
+        """Total throughput relative to the single-node run times the nodes."""
+        if self.scaling_nodes == 1:
+            return 100.0
+
+        single_node = self.getdep(self.single_node_variant())
+        single_node_total = sn.extractsingle(
+            r"Total average: (?P<samples_per_sec_total>\S+)\s+images",
+            os.path.join(single_node.stagedir, single_node.job.stdout),
+            "samples_per_sec_total",
+            float,
+        )
+        total = sn.extractsingle(
+            r"Total average: (?P<samples_per_sec_total>\S+)\s+images",
+            self.stdout,
+            "samples_per_sec_total",
+            float,
+        )
+        return 100 * total / (self.scaling_nodes * single_node_total)
+
+
+@rfm.simple_test
+class pytorch_distr_cnn_cpu(PytorchDistrCnnBase, TopologyMixin):
+    descr = "Check the training throughput of a cnn with torch.distributed on CPUs"
+    valid_systems = ["cyclone:cpu"]
+    valid_prog_environs = ["PrgEnv-gnu-nompi-nocuda"]
+    # The CPU-only build of the same PyTorch
+    modules = ["torchvision/0.13.1-foss-2022a"]
+    # The cores of a node split into ranks of equally many threads
+    ranks_per_node = parameter([1, 2, 4, 5, 10, 20, 40])
+    num_nodes = 1
+    num_gpus_per_node = 0
+    # The node trains on the same images per step for every split
+    batch_size_per_node = 80
+
+    @run_after("setup")
+    def set_cpu_split(self):
+        self.num_tasks_per_node = self.ranks_per_node
+        self.num_tasks = self.num_tasks_per_node * self.num_nodes
+        self.bind_omp_threads(self.num_cores_per_node // self.ranks_per_node)
+        global_batch_size = self.batch_size_per_node * self.num_nodes
+        self.executable_opts += [
+            "--backend=gloo",
+            "--data=device",
+            f"--global-batch-size={global_batch_size}",
+            f"--num-threads={self.num_cpus_per_task}",
         ]
+
+    @run_before("run")
+    def set_cpu_binding(self):
+        self.job.launcher.options.append("--cpu-bind=cores")
+
+    @run_after("setup")
+    def set_reference(self):
+        # No reference yet, the CPU throughput is collected for planning
+        self.reference = {}
+
+    @run_before("performance")
+    def rename_per_gpu_variables(self):
+        # A rank runs on cores of the node, not on a GPU
+        self.perf_variables["samples_per_sec_per_rank"] = self.perf_variables.pop(
+            "samples_per_sec_per_gpu"
+        )
+
+    @performance_function("samples/sec")
+    def samples_per_sec_per_node(self):
+        return (
+            sn.extractsingle(
+                r"Total average: (?P<samples_per_sec_total>\S+)\s+images",
+                self.stdout,
+                "samples_per_sec_total",
+                float,
+            )
+            / self.num_nodes
+        )
+
+
+@rfm.simple_test
+class pytorch_hierarchical_allreduce_check(rfm.RunOnlyRegressionTest):
+    descr = "Check the hierarchical allreduce hook against the flat DDP allreduce"
+    valid_systems = ["cyclone:cpu"]
+    valid_prog_environs = ["PrgEnv-gnu-nompi-nocuda"]
+    sourcesdir = "src"
+    # Two ranks on each of two nodes, many small buckets in every backward pass
+    num_tasks = 4
+    num_tasks_per_node = 2
+    num_steps = variable(int, value=30)
+    bucket_cap_mb = variable(float, value=0.5)
+    # A hook that issues the collectives out of order hangs until the limit
+    time_limit = "10m"
+    executable = "python hierarchical_allreduce_check.py"
+
+    modules = ["torchvision/0.13.1-foss-2022a"]
+
+    maintainers = ["cstyl"]
+    tags = {"applications", "diagnostic"}
+
+    @run_after("init")
+    def set_options(self):
+        self.executable_opts += [
+            f"--steps={self.num_steps}",
+            f"--bucket-cap-mb={self.bucket_cap_mb}",
+        ]
+
+    @sanity_function
+    def assert_gradients_match(self):
+        steps = sn.extractall(r"Rank \d+: steps completed: (\d+)", self.stdout, 1, int)
+        diffs = sn.extractall(
+            r"Rank \d+: max gradient difference: (\S+)", self.stdout, 1, float
+        )
+        return sn.all(
+            [
+                sn.assert_eq(sn.count(steps), self.num_tasks),
+                sn.all(sn.map(lambda n: sn.assert_eq(n, self.num_steps), steps)),
+                sn.assert_eq(sn.count(diffs), self.num_tasks),
+                sn.assert_lt(sn.max(diffs), 1e-5),
+            ]
+        )
@@ -1,3 +1,5 @@
+import argparse
+import json
 import os
 import random
 import time
@@ -6,30 +8,155 @@ import torch
 import torch.distributed as dist
 import torch.nn.functional as F
 import torch.optim as optim
+from torch.distributed.algorithms.ddp_comm_hooks import default_hooks, powerSGD_hook
 from torch.nn.parallel import DistributedDataParallel
 from torch.utils.data import DataLoader, Dataset, DistributedSampler
 from torchvision import models
 from pt_distr_env import DistributedEnviron
 
+parser = argparse.ArgumentParser()
+parser.add_argument(
+    "--backend",
+    choices=["nccl", "gloo"],
+    default="nccl",
+    help="torch.distributed backend, gloo trains on the CPU",
+)
+parser.add_argument(
+    "--allreduce",
+    choices=["flat", "hierarchical"],
+    default="flat",
+    help="flat: DDP's allreduce over all ranks, "
+    "hierarchical: reduce within each node, then allreduce across nodes",
+)
+parser.add_argument(
+    "--data",
+    choices=["dataset", "pinned", "device", "workers"],
+    default="dataset",
+    help="dataset: generate every sample on the main process, "
+    "pinned: reuse one pre-allocated (pinned) batch copied to the device every step, "
+    "device: reuse one batch resident on the device, "
+    "workers: generate the samples with --data-workers loader processes",
+)
+parser.add_argument(
+    "--data-workers",
+    type=int,
+    default=4,
+    help="number of loader processes of the workers data mode",
+)
+parser.add_argument(
+    "--batch-size",
+    type=int,
+    default=256,
+    help="batch size per GPU, for weak scaling",
+)
+parser.add_argument(
+    "--global-batch-size",
+    type=int,
+    help="batch size summed over all GPUs, for strong scaling, "
+    "overrides --batch-size",
+)
+parser.add_argument(
+    "--model",
+    default="resnet50",
+    help="name of the torchvision model to train",
+)
+parser.add_argument(
+    "--precision",
+    choices=["fp32", "fp16", "bf16"],
+    default="fp32",
+    help="fp16 and bf16 train with automatic mixed precision, "
+    "fp16 also scales the loss with a grad scaler",
+)
+parser.add_argument(
+    "--channels-last",
+    action="store_true",
+    help="keep the model and the images in the channels_last memory format",
+)
+parser.add_argument(
+    "--compile",
+    action="store_true",
+    help="compile the model with torch.compile",
+)
+parser.add_argument(
+    "--bucket-cap-mb",
+    type=float,
+    default=25,
+    help="size of DDP's gradient buckets in MiB",
+)
+parser.add_argument(
+    "--gradient-as-bucket-view",
+    action="store_true",
+    help="let the gradients be views into DDP's buckets instead of copies",
+)
+parser.add_argument(
+    "--static-graph",
+    action="store_true",
+    help="tell DDP that the graph and the used parameters never change",
+)
+parser.add_argument(
+    "--comm-hook",
+    choices=["allreduce", "fp16", "bf16", "powersgd"],
+    default="allreduce",
+    help="allreduce: DDP's plain allreduce of the gradients, "
+    "fp16/bf16: allreduce the gradients compressed to fp16/bf16, "
+    "powersgd: allreduce a rank 1 PowerSGD approximation of the gradients",
+)
+parser.add_argument(
+    "--num-threads",
+    type=int,
+    help="number of intra-op threads of every rank, torch's default if not set",
+)
+parser.add_argument(
+    "--step-times-dir",
+    default=".",
+    help="directory of the per-rank step time statistics (step_times.<rank>.json)",
+)
+args = parser.parse_args()
+if args.backend == "gloo" and args.precision == "fp16":
+    parser.error("fp16 needs a GPU, use --precision=bf16 with gloo")
+if args.compile and not hasattr(torch, "compile"):
+    parser.error("--compile needs PyTorch 2.0 or newer")
+if args.allreduce == "hierarchical" and args.comm_hook != "allreduce":
+    parser.error("the hierarchical allreduce cannot be combined with --comm-hook")
 
 num_warmup_epochs = 2
 num_epochs = 5
-batch_size_per_gpu = 256
 num_iters = 25
-model_name = "resnet50"
+
+if args.num_threads is not None:
+    torch.set_num_threads(args.num_threads)
 
 distr_env = DistributedEnviron()
-dist.init_process_group(backend="nccl")
+dist.init_process_group(backend=args.backend)
+distr_env.init_process_groups()
 world_size = dist.get_world_size()
 rank = dist.get_rank()
-device = 0  # distr_env.local_rank  # since CUDA_VISIBLE_DEVICES=$SLURM_LOCALID
-device_count = torch.cuda.device_count()
+if args.backend == "nccl":
+    device = 0  # distr_env.local_rank  # since CUDA_VISIBLE_DEVICES=$SLURM_LOCALID
+else:
+    device = "cpu"
 
-model = getattr(models, model_name)()
-model.to(device)
+if args.global_batch_size is None:
+    batch_size_per_gpu = args.batch_size
+elif args.global_batch_size % world_size == 0:
+    batch_size_per_gpu = args.global_batch_size // world_size
+else:
+    parser.error(
+        f"the global batch size {args.global_batch_size} is not divisible "
+        f"by the world size {world_size}"
+    )
+
+memory_format = torch.channels_last if args.channels_last else torch.contiguous_format
+model = getattr(models, args.model)()
+model.to(device, memory_format=memory_format)
 
 optimizer = optim.SGD(model.parameters(), lr=0.01)
 
+# bf16 has the range of fp32 and needs no loss scaling
+autocast_dtype = {"fp16": torch.float16, "bf16": torch.bfloat16}.get(args.precision)
+autocast_device = "cuda" if args.backend == "nccl" else "cpu"
+scaler = torch.cuda.amp.GradScaler(enabled=args.precision == "fp16")
+
 
 class SyntheticDataset(Dataset):
     def __getitem__(self, idx):
@@ -41,48 +168,236 @@ class SyntheticDataset(Dataset):
         return batch_size_per_gpu * num_iters * world_size
 
 
-ddp_model = DistributedDataParallel(model, device_ids=[device])
+def hierarchical_allreduce_hook(distr_env, bucket):
+    """DDP communication hook averaging the gradients node by node."""
+    tensor = bucket.buffer().div_(world_size)
+    return distr_env.hierarchical_all_reduce(tensor, async_op=True)
+
+
+ddp_model = DistributedDataParallel(
+    model,
+    device_ids=[device] if args.backend == "nccl" else None,
+    bucket_cap_mb=args.bucket_cap_mb,
+    gradient_as_bucket_view=args.gradient_as_bucket_view,
+    static_graph=args.static_graph,
+)
+if args.allreduce == "hierarchical":
+    ddp_model.register_comm_hook(distr_env, hierarchical_allreduce_hook)
+elif args.comm_hook == "fp16":
+    ddp_model.register_comm_hook(None, default_hooks.fp16_compress_hook)
+elif args.comm_hook == "bf16":
+    ddp_model.register_comm_hook(None, default_hooks.bf16_compress_hook)
+elif args.comm_hook == "powersgd":
+    # Plain allreduce during the first warmup epoch, as PowerSGD recommends
+    powersgd_state = powerSGD_hook.PowerSGDState(
+        process_group=None, matrix_approximation_rank=1, start_powerSGD_iter=num_iters
+    )
+    ddp_model.register_comm_hook(powersgd_state, powerSGD_hook.powerSGD_hook)
+if args.compile:
+    ddp_model = torch.compile(ddp_model)
 
 train_set = SyntheticDataset()
 train_sampler = DistributedSampler(
     train_set, num_replicas=world_size, rank=rank, shuffle=False, seed=42
 )
-train_loader = DataLoader(
-    train_set, batch_size=batch_size_per_gpu, shuffle=False, sampler=train_sampler
-)
+pin_memory = args.backend == "nccl"
+if args.data == "workers":
+    train_loader = DataLoader(
+        train_set,
+        batch_size=batch_size_per_gpu,
+        shuffle=False,
+        sampler=train_sampler,
+        num_workers=args.data_workers,
+        pin_memory=pin_memory,
+        persistent_workers=True,
+    )
+else:
+    train_loader = DataLoader(
+        train_set, batch_size=batch_size_per_gpu, shuffle=False, sampler=train_sampler
+    )
+
+# The single batch reused by the pinned and device data modes
+batch_imgs = torch.randn(batch_size_per_gpu, 3, 224, 224)
+batch_labels = torch.randint(0, 1000, (batch_size_per_gpu,))
+if args.data == "pinned" and pin_memory:
+    batch_imgs = batch_imgs.pin_memory()
+    batch_labels = batch_labels.pin_memory()
+elif args.data == "device":
+    batch_imgs = batch_imgs.to(device, memory_format=memory_format)
+    batch_labels = batch_labels.to(device)
+
+
+def train_batches():
+    """Yield the (imgs, labels) batches of one epoch on the device."""
+    if args.data in ("dataset", "workers"):
+        for imgs, labels in train_loader:
+            yield (
+                imgs.to(device, non_blocking=pin_memory, memory_format=memory_format),
+                labels.to(device, non_blocking=pin_memory),
+            )
+    else:
+        for step in range(num_iters):
+            yield (
+                batch_imgs.to(
+                    device, non_blocking=pin_memory, memory_format=memory_format
+                ),
+                batch_labels.to(device, non_blocking=pin_memory),
+            )
+
+
+class StepTimer:
+    """Time the phases of every training step.
+
+    On the GPU the phases are delimited by CUDA events and the device is
+    synchronized once at the end of every step, so the times are those of
+    the GPU work rather than of the kernel launches. On the CPU the work is
+    synchronous and a wall clock timer is enough.
+    """
+
+    phases = ("data", "forward", "backward", "optimizer")
+
+    def __init__(self, use_cuda):
+        self.use_cuda = use_cuda
+        self.times = {phase: [] for phase in self.phases + ("step",)}
+        self._marks = []
+
+    def _now(self):
+        if self.use_cuda:
+            event = torch.cuda.Event(enable_timing=True)
+            event.record()
+            return event
+        return time.perf_counter()
+
+    def _elapsed(self, start, end):
+        if self.use_cuda:
+            return start.elapsed_time(end) / 1000
+        return end - start
 
+    def start(self):
+        """Start a new step, dropping the marks of an unfinished one."""
+        self._marks = [self._now()]
 
-def benchmark_step(model, imgs, labels):
+    def mark(self):
+        """End the current phase of the step."""
+        self._marks.append(self._now())
+
+    def stop(self):
+        """End the last phase and record the times of the step."""
+        self.mark()
+        if self.use_cuda:
+            self._marks[-1].synchronize()
+        for phase, start, end in zip(self.phases, self._marks, self._marks[1:]):
+            self.times[phase].append(self._elapsed(start, end))
+        self.times["step"].append(self._elapsed(self._marks[0], self._marks[-1]))
+
+    def stats(self):
+        """Return the p50/p95/max (in seconds) of every phase and the step."""
+        stats = {}
+        for phase, times in self.times.items():
+            stats[phase] = {
+                "p50": float(np.percentile(times, 50)),
+                "p95": float(np.percentile(times, 95)),
+                "max": float(np.max(times)),
+            }
+        return stats
+
+
+def benchmark_step(model, imgs, labels, timer):
     optimizer.zero_grad()
-    output = model(imgs.to(device))
-    loss = F.cross_entropy(output, labels.to(device))
-    loss.backward()
-    optimizer.step()
+    with torch.autocast(
+        autocast_device, dtype=autocast_dtype, enabled=autocast_dtype is not None
+    ):
+        output = model(imgs)
+        loss = F.cross_entropy(output, labels)
+    timer.mark()
+    # Includes DDP's allreduce of the gradients, which overlaps the backward
+    scaler.scale(loss).backward()
+    timer.mark()
+    scaler.step(optimizer)
+    scaler.update()
+    timer.stop()
+
+
+def benchmark_epoch(model, timer):
+    """Train for one epoch and return the time spent waiting for data."""
+    data_time = 0.0
+    batches = train_batches()
+    while True:
+        t0 = time.time()
+        timer.start()
+        try:
+            imgs, labels = next(batches)
+        except StopIteration:
+            break
+        data_time += time.time() - t0
+        timer.mark()
+        benchmark_step(model, imgs, labels, timer)
+
+    return data_time
 
 
 # warmup
+warmup_timer = StepTimer(use_cuda=args.backend == "nccl")
 for epoch in range(num_warmup_epochs):
-    for step, (imgs, labels) in enumerate(train_loader):
-        benchmark_step(ddp_model, imgs, labels)
+    benchmark_epoch(ddp_model, warmup_timer)
 
 # benchmark
 imgs_sec = []
+timer = StepTimer(use_cuda=args.backend == "nccl")
 for epoch in range(num_epochs):
     t0 = time.time()
-    for step, (imgs, labels) in enumerate(train_loader):
-        benchmark_step(ddp_model, imgs, labels)
-
+    data_time = benchmark_epoch(ddp_model, timer)
     dt = time.time() - t0
     imgs_sec.append(batch_size_per_gpu * num_iters / dt)
 
     if rank == 0:
         print(
             f" * Rank {rank} - Epoch {epoch:2d}: "
-            f"{imgs_sec[epoch]:.2f} images/sec per GPU"
+            f"{imgs_sec[epoch]:.2f} images/sec per GPU "
+            f"(data {data_time:.3f} s, compute {dt - data_time:.3f} s)"
         )
 
-imgs_sec_total = np.mean(imgs_sec) * world_size * device_count
+# Every rank runs on its own GPU, the total is the sum over the ranks
+rank_imgs_sec = torch.tensor([np.mean(imgs_sec)], dtype=torch.float64, device=device)
+all_imgs_sec = [torch.zeros_like(rank_imgs_sec) for _ in range(world_size)]
+dist.all_gather(all_imgs_sec, rank_imgs_sec)
+all_imgs_sec = [gathered.item() for gathered in all_imgs_sec]
+imgs_sec_total = sum(all_imgs_sec)
 if rank == 0:
     print(f" * Total average: {imgs_sec_total:.2f} images/sec")
+    print(
+        f" * Slowest rank: {np.argmin(all_imgs_sec)} - "
+        f"{min(all_imgs_sec):.2f} images/sec per GPU"
+    )
+
+# Without the gradient allreduce, the backward slows down by the part of
+# the allreduce that the backward computation does not hide
+no_sync_timer = StepTimer(use_cuda=args.backend == "nccl")
+with ddp_model.no_sync():
+    benchmark_epoch(ddp_model, no_sync_timer)
+stats = timer.stats()
+no_sync_stats = no_sync_timer.stats()
+allreduce_time = max(stats["backward"]["p50"] - no_sync_stats["backward"]["p50"], 0.0)
+if rank == 0:
+    print(
+        f" * Allreduce time: {allreduce_time:.4f} s per step "
+        f"(backward {stats['backward']['p50']:.4f} s, "
+        f"without allreduce {no_sync_stats['backward']['p50']:.4f} s)"
+    )
+
+step_times = {
+    "rank": rank,
+    "local_rank": distr_env.local_rank,
+    "hostname": distr_env.hostname,
+    "num_steps": len(timer.times["step"]),
+    "batch_size": batch_size_per_gpu,
+    "samples_per_sec": all_imgs_sec[rank],
+    "stats": stats,
+    "no_sync_stats": no_sync_stats,
+    "allreduce_time": allreduce_time,
+}
+step_times_file = os.path.join(args.step_times_dir, f"step_times.{rank}.json")
+with open(step_times_file, "w") as fp:
+    json.dump(step_times, fp, indent=2)
 
 dist.destroy_process_group()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+"""Check of the hierarchical allreduce as a DDP communication hook.
+
+Trains two copies of a small model, one with DDP's flat allreduce and one
+with DistributedEnviron.hierarchical_all_reduce() as its communication
+hook. The buckets are small, so that every backward pass has many of them
+in flight. Every rank prints the number of steps it completed and the
+largest difference between the gradients of the two copies. A hook that
+issues the collectives of the buckets out of order hangs here.
+
+Usage: srun python hierarchical_allreduce_check.py [--steps 30]
+    [--bucket-cap-mb 0.5]
+"""
+
+import argparse
+
+import torch
+import torch.distributed as dist
+from torch.nn.parallel import DistributedDataParallel
+
+from pt_distr_env import DistributedEnviron
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--steps", type=int, default=30)
+parser.add_argument("--bucket-cap-mb", type=float, default=0.5)
+args = parser.parse_args()
+
+distr_env = DistributedEnviron()
+dist.init_process_group(backend="gloo")
+distr_env.init_process_groups()
+world_size = dist.get_world_size()
+rank = dist.get_rank()
+
+
+def hierarchical_allreduce_hook(distr_env, bucket):
+    tensor = bucket.buffer().div_(world_size)
+    return distr_env.hierarchical_all_reduce(tensor, async_op=True)
+
+
+def make_model():
+    torch.manual_seed(0)
+    return torch.nn.Sequential(*[torch.nn.Linear(256, 256) for _ in range(30)])
+
+
+model = make_model()
+flat_model = make_model()
+ddp_model = DistributedDataParallel(model, bucket_cap_mb=args.bucket_cap_mb)
+ddp_model.register_comm_hook(distr_env, hierarchical_allreduce_hook)
+flat_ddp_model = DistributedDataParallel(flat_model, bucket_cap_mb=args.bucket_cap_mb)
+
+max_diff = 0.0
+for step in range(args.steps):
+    torch.manual_seed(1000 * rank + step)
+    x = torch.randn(8, 256)
+    for m in (ddp_model, flat_ddp_model):
+        m.zero_grad()
+        m(x).sum().backward()
+
+    for param, flat_param in zip(model.parameters(), flat_model.parameters()):
+        max_diff = max(max_diff, (param.grad - flat_param.grad).abs().max().item())
+
+print(f"Rank {rank}: steps completed: {args.steps}", flush=True)
+print(f"Rank {rank}: max gradient difference: {max_diff:.3e}", flush=True)
+dist.destroy_process_group()
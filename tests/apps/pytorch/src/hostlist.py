@@ -39,7 +39,10 @@ compatibility with pdsh/dshbak/SLURM et al.
 __version__ = "1.17"
 
 import re
+import bisect
+import functools
 import itertools
+import collections.abc
 
 
 # Exception used for error reporting to the caller
@@ -50,6 +53,28 @@ class BadHostlist(Exception):
 # Configuration to guard against ridiculously long expanded lists
 MAX_SIZE = 100000
 
+# Number of distinct expressions remembered by the cached functions
+CACHE_SIZE = 128
+
+# Regular expressions, compiled once instead of on every call
+
+# A part split into prefix, rangelist in brackets (may be missing) and the rest
+part_re = re.compile(r"([^,\[]*)(\[[^\]]*\])?(.*)")
+# A range of a rangelist, a single number or low-high
+number_re = re.compile(r"^[0-9]+$")
+range_re = re.compile(r"^([0-9]+)-([0-9]+)$")
+number_or_range_re = re.compile(r"^([0-9]+)(?:-([0-9]+))?$")
+# The leading digits of a string
+digits_re = re.compile(r"[0-9]*")
+# The three special characters in the hostlist syntax
+forbidden_re = re.compile(r"[][,]")
+# A left part split into prefix, rightmost number (may be missing) and suffix
+left_right_re = re.compile(r"^(.*?)([0-9]+)?([^0-9]*)$")
+# Same as above but with "" for a missing number
+left_re = re.compile(r"(.*?)([0-9]*)([^0-9]*)", re.DOTALL)
+# An entry of SLURM_TASKS_PER_NODE, e.g. "2(x3)"
+tasks_re = re.compile(r"^([0-9]+)(\(x([0-9]+)\))?$")
+
 # Hostlist expansion
 
 
@@ -64,6 +89,27 @@ def expand_hostlist(hostlist, allow_duplicates=False, sort=False):
     """
 
     results = []
+    for part in split_hostlist(hostlist):
+        results.extend(expand_part(part))
+
+    if not allow_duplicates:
+        results = remove_duplicates(results)
+    if sort:
+        results = numerically_sorted(results)
+    return results
+
+
+def split_hostlist(hostlist):
+    """Split a hostlist expression at its top level commas.
+
+    Example: split_hostlist("n[9-11],d[01-02]") ==>
+             'n[9-11]', 'd[01-02]'
+
+    This is a generator, so parts are yielded as soon as they are
+    complete. Empty parts are skipped and bad bracket nesting raises
+    BadHostlist.
+    """
+
     bracket_level = 0
     part = ""
 
@@ -71,9 +117,8 @@ def expand_hostlist(hostlist, allow_duplicates=False, sort=False):
         if c == "," and bracket_level == 0:
             # Comma at top level, split!
             if part:
-                results.extend(expand_part(part))
+                yield part
             part = ""
-            bad_part = False
         else:
             part += c
 
@@ -90,12 +135,6 @@ def expand_hostlist(hostlist, allow_duplicates=False, sort=False):
     if bracket_level > 0:
         raise BadHostlist("unbalanced brackets")
 
-    if not allow_duplicates:
-        results = remove_duplicates(results)
-    if sort:
-        results = numerically_sorted(results)
-    return results
-
 
 def expand_part(s):
     """Expand a part (e.g. "x[1-2]y[1-3][1-3]") (no outer level commas)."""
@@ -109,7 +148,7 @@ def expand_part(s):
     # 2) rangelist in brackets (may be missing)
     # 3) the rest
 
-    m = re.match(r"([^,\[]*)(\[[^\]]*\])?(.*)", s)
+    m = part_re.match(s)
     (prefix, rangelist, rest) = m.group(1, 2, 3)
 
     # Expand the rest first (here is where we recurse!)
@@ -147,12 +186,12 @@ def expand_range(prefix, range_):
     """Expand a range (e.g. 1-10 or 14), putting a prefix before."""
 
     # Check for a single number first
-    m = re.match(r"^[0-9]+$", range_)
+    m = number_re.match(range_)
     if m:
         return ["%s%s" % (prefix, range_)]
 
     # Otherwise split low-high
-    m = re.match(r"^([0-9]+)-([0-9]+)$", range_)
+    m = range_re.match(range_)
     if not m:
         raise BadHostlist("bad range")
 
@@ -183,6 +222,215 @@ def remove_duplicates(l):
     return results
 
 
+# Lazy hostlist representation
+#
+# Expanding a hostlist formats every single hostname up front. For long
+# lists (and when only a few hosts are needed, e.g. the first one) it is
+# cheaper to keep the expression in its compact form and to format
+# hostnames on demand. A part like "rack[1-4]cn[01-64]" is kept as a
+# chain of HostRange objects (one per bracketed field) and a HostList
+# is the concatenation of such chains.
+
+
+class HostRange(collections.abc.Sequence):
+    """A prefix followed by a list of (low, high, width) intervals.
+
+    Example: HostRange("cn", [(1, 3, 2), (10, 10, 2)]) holds
+             'cn01', 'cn02', 'cn03', 'cn10'
+
+    A HostRange without intervals holds the prefix alone.
+    """
+
+    def __init__(self, prefix, intervals=()):
+        self.prefix = prefix
+        self.intervals = tuple(intervals)
+
+        # Start offset of each interval, used to locate an index
+        self._offsets = []
+        size = 0
+        for low, high, width in self.intervals:
+            self._offsets.append(size)
+            size += high - low + 1
+        self._size = size if self.intervals else 1
+
+    @classmethod
+    def from_rangelist(cls, prefix, rangelist):
+        """Create a HostRange from a rangelist (e.g. "1-10,14")."""
+
+        intervals = []
+        for range_ in rangelist.split(","):
+            m = number_or_range_re.match(range_)
+            if not m:
+                raise BadHostlist("bad range")
+
+            (s_low, s_high) = m.group(1, 2)
+            low = int(s_low)
+            high = low if s_high is None else int(s_high)
+            if high < low:
+                raise BadHostlist("start > stop")
+            intervals.append((low, high, len(s_low)))
+        return cls(prefix, intervals)
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._size))]
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError("host range index out of range")
+        if not self.intervals:
+            return self.prefix
+
+        i = bisect.bisect_right(self._offsets, index) - 1
+        low, high, width = self.intervals[i]
+        return "%s%0*d" % (self.prefix, width, low + index - self._offsets[i])
+
+    def __iter__(self):
+        if not self.intervals:
+            yield self.prefix
+            return
+        for low, high, width in self.intervals:
+            for num in range(low, high + 1):
+                yield "%s%0*d" % (self.prefix, width, num)
+
+    def __contains__(self, host):
+        return "" in self.match(host)
+
+    def match(self, host):
+        """Return the set of tails left after matching host's head.
+
+        Example: HostRange("n", [(1, 12, 1)]).match("n12x") ==> {'2x', 'x'}
+        """
+
+        if not isinstance(host, str) or not host.startswith(self.prefix):
+            return set()
+        rest = host[len(self.prefix) :]
+        if not self.intervals:
+            return {rest}
+
+        # Try every leading run of digits as the number of this field
+        tails = set()
+        m = digits_re.match(rest)
+        for end in range(1, m.end() + 1):
+            num_str = rest[:end]
+            num = int(num_str)
+            for low, high, width in self.intervals:
+                if low <= num <= high and "%0*d" % (width, num) == num_str:
+                    tails.add(rest[end:])
+                    break
+        return tails
+
+    def __repr__(self):
+        return "HostRange(%r, %r)" % (self.prefix, list(self.intervals))
+
+
+def parse_part(s):
+    """Parse a part (e.g. "x[1-2]y[1-3][1-3]") into a tuple of HostRange.
+
+    The hosts of the part are all combinations of the hosts of the
+    ranges, with the last range varying fastest (as in expand_part).
+    """
+
+    ranges = []
+    while s:
+        m = part_re.match(s)
+        (prefix, rangelist, s) = m.group(1, 2, 3)
+        if rangelist:
+            ranges.append(HostRange.from_rangelist(prefix, rangelist[1:-1]))
+        else:
+            ranges.append(HostRange(prefix))
+    return tuple(ranges)
+
+
+def iter_part(ranges):
+    """Iterate over the hosts of a tuple of HostRange, last range fastest.
+
+    The first range is iterated lazily, only the (usually short) hosts
+    of the trailing ranges are formatted up front.
+    """
+
+    if len(ranges) == 1:
+        yield from ranges[0]
+        return
+    tails = ["".join(names) for names in itertools.product(*ranges[1:])]
+    for head in ranges[0]:
+        for tail in tails:
+            yield head + tail
+
+
+class HostList(collections.abc.Sequence):
+    """Lazy sequence of the hosts in a hostlist expression.
+
+    Example: HostList("n[9-11],d[01-02]")[1] ==> 'n10'
+
+    The hosts are the same as expand_hostlist(hostlist,
+    allow_duplicates=True) returns, but they are only formatted when
+    asked for. len(), indexing, membership tests and iteration do not
+    materialize the list, and the list is not limited by MAX_SIZE.
+    Slicing returns a plain list of the selected hosts.
+    """
+
+    def __init__(self, hostlist):
+        self.hostlist = hostlist
+        self.parts = [parse_part(part) for part in split_hostlist(hostlist)]
+
+        # Start offset of each part, used to locate an index
+        self._offsets = []
+        size = 0
+        for part in self.parts:
+            self._offsets.append(size)
+            part_size = 1
+            for range_ in part:
+                part_size *= len(range_)
+            size += part_size
+        self._size = size
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._size))]
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError("hostlist index out of range")
+
+        i = bisect.bisect_right(self._offsets, index) - 1
+        index -= self._offsets[i]
+
+        # Mixed radix decomposition, the last range varies fastest
+        names = []
+        for range_ in reversed(self.parts[i]):
+            index, j = divmod(index, len(range_))
+            names.append(range_[j])
+        return "".join(reversed(names))
+
+    def __iter__(self):
+        for part in self.parts:
+            yield from iter_part(part)
+
+    def __contains__(self, host):
+        for part in self.parts:
+            tails = {host}
+            for range_ in part:
+                tails = set().union(*(range_.match(tail) for tail in tails))
+                if not tails:
+                    break
+            if "" in tails:
+                return True
+        return False
+
+    def __str__(self):
+        return self.hostlist
+
+    def __repr__(self):
+        return "HostList(%r)" % self.hostlist
+
+
 # Hostlist collection
 
 
@@ -201,7 +449,18 @@ def collect_hostlist(hosts, silently_discard_bad=False):
     # The idea is to move already collected numerical parts from the
     # left side (seen by each loop) to the right side (just copied).
 
-    left_right = []
+    left_right = [(host, "") for host in check_hosts(hosts, silently_discard_bad)]
+
+    # Call the iterative function until it says it's done
+    looping = True
+    while looping:
+        left_right, looping = collect_hostlist_1(left_right)
+    return ",".join([left + right for left, right in left_right])
+
+
+def check_hosts(hosts, silently_discard_bad=False):
+    """Strip the hosts to collect and skip empty or (optionally) bad ones."""
+
     for host in hosts:
         # We remove leading and trailing whitespace first, and skip empty lines
         host = host.strip()
@@ -210,19 +469,13 @@ def collect_hostlist(hosts, silently_discard_bad=False):
 
         # We cannot accept a host containing any of the three special
         # characters in the hostlist syntax (comma and flat brackets)
-        if re.search(r"[][,]", host):
+        if forbidden_re.search(host):
             if silently_discard_bad:
                 continue
             else:
                 raise BadHostlist("forbidden character")
 
-        left_right.append((host, ""))
-
-    # Call the iterative function until it says it's done
-    looping = True
-    while looping:
-        left_right, looping = collect_hostlist_1(left_right)
-    return ",".join([left + right for left, right in left_right])
+        yield host
 
 
 def collect_hostlist_1(left_right):
@@ -244,7 +497,7 @@ def collect_hostlist_1(left_right):
         remaining.add(host)
 
         # Match the left part into parts
-        m = re.match(r"^(.*?)([0-9]+)?([^0-9]*)$", left)
+        m = left_right_re.match(left)
         (prefix, num_str, suffix) = m.group(1, 2, 3)
 
         # Add the right part unprocessed to the suffix.
@@ -354,6 +607,113 @@ def format_range(low, high, width):
         return "%0*d-%0*d" % (width, low, width, high)
 
 
+# Grouped hostlist collection
+#
+# collect_hostlist sorts all (left, right) entries on nested tuple keys
+# and then finds ranges by formatting candidate hostnames and looking
+# them up in a set of strings. The engine below returns exactly the
+# same string, but groups the entries on their (prefix, suffix) key
+# first, so that only the distinct keys need sorting. Within a group,
+# each number is encoded as a single int (num * base + width), so that
+# sorting and range merging work on plain ints. Later loops only see
+# one entry per group of the previous loop, so the cost is dominated
+# by one regexp match, one dict lookup and one int sort per host.
+
+
+def collect_hostlist_grouped(hosts, silently_discard_bad=False):
+    """Collect a hostlist string from a Python list of hosts.
+
+    This is a faster drop-in replacement of collect_hostlist and
+    returns exactly the same string.
+    """
+
+    left_right = [(host, "") for host in check_hosts(hosts, silently_discard_bad)]
+
+    looping = True
+    while looping:
+        left_right, looping = collect_hostlist_grouped_1(left_right)
+    return ",".join([left + right for left, right in left_right])
+
+
+def collect_hostlist_grouped_1(left_right):
+    """Collect the rightmost numeric part of a list of (left, right) hosts.
+
+    This is the equivalent of collect_hostlist_1.
+    """
+
+    # Map the same (prefix, suffix) keys as collect_hostlist_1 sorts on
+    # to the numbers found with them
+    groups = {}
+    for left, right in left_right:
+        (prefix, num_str, suffix) = left_re.fullmatch(left).groups()
+        if num_str:
+            key = (prefix, suffix + right)
+        else:
+            key = (left + right, None)
+
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = []
+        group.append(num_str)
+
+    # Sorting the keys gives the same order as collect_hostlist_1
+    results = []
+    needs_another_loop = False
+    for key in sorted(groups):
+        (prefix, suffix) = key
+        if suffix is None:
+            # Special case: a host with no numeric part
+            results.append(("", prefix))
+            continue
+
+        # Encode each (num, width) as num * base + width, which sorts
+        # the same way. A range starting at low with width w covers the
+        # hosts low, low + 1, ... formatted as "%0*d" % (w, i), i.e. the
+        # (i, max(w, len(str(i)))) ones.
+        nums = groups[key]
+        base = max(map(len, nums)) + 1
+        remaining = set([int(num_str) * base + len(num_str) for num_str in nums])
+        range_list = []
+        for code in sorted(remaining):
+            if code not in remaining:
+                continue
+            (low, width) = divmod(code, base)
+            limit = 10**width
+            high = low
+            while True:
+                if high < limit:
+                    code = high * base + width
+                else:
+                    high_width = len(str(high))
+                    if high_width >= base:
+                        break
+                    code = high * base + high_width
+                if code not in remaining:
+                    break
+                remaining.remove(code)
+                high += 1
+            range_list.append((low, high - 1, width))
+
+        needs_another_loop = True
+        if len(range_list) == 1 and range_list[0][0] == range_list[0][1]:
+            # Special case to make sure that n1 is not shown as n[1] etc
+            results.append(
+                (prefix, "%0*d%s" % (range_list[0][2], range_list[0][0], suffix))
+            )
+        else:
+            results.append(
+                (
+                    prefix,
+                    "["
+                    + ",".join([format_range(l, h, w) for l, h, w in range_list])
+                    + "]"
+                    + suffix,
+                )
+            )
+
+    return results, needs_another_loop
+
+
 # Sort a list of hosts numerically
 
 
@@ -363,7 +723,20 @@ def numerically_sorted(l):
     E.g. sorted order should be n1, n2, n10; not n1, n10, n2.
     """
 
-    return sorted(l, key=numeric_sort_key)
+    # Long lists of hosts (e.g. from perflogs) repeat the same names
+    # over and over. Compute the key of each distinct host once, sort
+    # the distinct hosts and then sort the list on their plain int
+    # rank. Hosts with equal keys (e.g. n1 and n01) share a rank, so
+    # the result is the same as sorted(l, key=numeric_sort_key).
+    keys = {host: numeric_sort_key(host) for host in set(l)}
+    rank = {}
+    previous_key = None
+    for host in sorted(keys, key=keys.__getitem__):
+        if keys[host] != previous_key:
+            previous_key = keys[host]
+            rank_ = len(rank)
+        rank[host] = rank_
+    return sorted(l, key=rank.__getitem__)
 
 
 nsk_re = re.compile("([0-9]+)|([^0-9]+)")
@@ -396,7 +769,7 @@ def handle_int_nonint(int_nonint_tuple):
 def parse_slurm_tasks_per_node(s):
     res = []
     for part in s.split(","):
-        m = re.match(r"^([0-9]+)(\(x([0-9]+)\))?$", part)
+        m = tasks_re.match(part)
         if m:
             tasks = int(m.group(1))
             repetitions = m.group(3)
@@ -413,6 +786,28 @@ def parse_slurm_tasks_per_node(s):
     return res
 
 
+# Cached fast path
+#
+# Every rank of a distributed job parses the very same SLURM_JOB_NODELIST
+# and SLURM_TASKS_PER_NODE strings, possibly more than once. The cached
+# variants remember the result per expression string. They return tuples
+# so that the cached results cannot be modified by the caller.
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def expand_hostlist_cached(hostlist, allow_duplicates=False, sort=False):
+    """Cached version of expand_hostlist, returning a tuple."""
+
+    return tuple(expand_hostlist(hostlist, allow_duplicates, sort))
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def parse_slurm_tasks_per_node_cached(s):
+    """Cached version of parse_slurm_tasks_per_node, returning a tuple."""
+
+    return tuple(parse_slurm_tasks_per_node(s))
+
+
 #
 # Keep this part to tell users where the command line interface went
 #
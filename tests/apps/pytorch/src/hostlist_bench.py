@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+"""Micro-benchmark of the hostlist module.
+
+Compares the time and the peak memory of the lazy HostList against the
+fully materialized expand_hostlist(), and of collect_hostlist_grouped()
+against collect_hostlist(), on node lists of growing size. Also times the
+cached parsing functions against repeated uncached parsing, and
+numerically_sorted() against sorting on numeric_sort_key().
+
+Usage: python hostlist_bench.py [--sizes 10000 100000 1000000 ...]
+"""
+
+import argparse
+import random
+import time
+import tracemalloc
+
+import hostlist
+
+
+def measure(fn, *args):
+    """Return (result, seconds, peak MiB) of a call to fn(*args)."""
+
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    result = fn(*args)
+    dt = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, dt, peak / 2**20
+
+
+def report(title, rows):
+    print(f"\n{title}")
+    print(f"{'size':>10} {'case':<34} {'time (s)':>10} {'peak (MiB)':>11}")
+    for size, case, dt, peak in rows:
+        print(f"{size:>10} {case:<34} {dt:>10.4f} {peak:>11.2f}")
+
+
+def expressions(size):
+    """Return a 1-D and a 2-D hostlist expression of the given size."""
+
+    racks = max(size // 100, 1)
+    return [
+        ("cn[1-%d]" % size, size),
+        ("rack[1-%d]cn[001-100]" % racks, racks * 100),
+    ]
+
+
+def bench_expand(sizes):
+    rows = []
+    for size in sizes:
+        for expr, n in expressions(size):
+            kind = "1-D" if expr.startswith("cn") else "2-D"
+            last = hostlist.HostList(expr)[-1]
+
+            # The old API refuses lists longer than MAX_SIZE
+            hostlist.MAX_SIZE = max(hostlist.MAX_SIZE, n)
+
+            _, dt, peak = measure(lambda: hostlist.expand_hostlist(expr)[0])
+            rows.append((n, f"expand_hostlist {kind} [0]", dt, peak))
+            _, dt, peak = measure(lambda: hostlist.HostList(expr)[0])
+            rows.append((n, f"HostList {kind} [0]", dt, peak))
+
+            _, dt, peak = measure(lambda: last in hostlist.expand_hostlist(expr))
+            rows.append((n, f"expand_hostlist {kind} in", dt, peak))
+            _, dt, peak = measure(lambda: last in hostlist.HostList(expr))
+            rows.append((n, f"HostList {kind} in", dt, peak))
+
+            _, dt, peak = measure(lambda: sum(1 for _ in hostlist.HostList(expr)))
+            rows.append((n, f"HostList {kind} iterate", dt, peak))
+    report("Hostlist expansion", rows)
+
+
+def host_lists(size):
+    """Return shuffled 1-D, 2-D and sparse host lists of the given size."""
+
+    rng = random.Random(42)
+    racks = max(size // 64, 1)
+    lists = [
+        ("1-D", ["cn%07d" % i for i in range(1, size + 1)]),
+        (
+            "2-D",
+            [
+                "rack%dcn%02d" % (r, c)
+                for r in range(1, racks + 1)
+                for c in range(1, 65)
+            ],
+        ),
+        ("sparse", ["cn%07d" % i for i in rng.sample(range(1, 2 * size), size)]),
+    ]
+    for _, hosts in lists:
+        rng.shuffle(hosts)
+    return lists
+
+
+def bench_collect(sizes):
+    rows = []
+    for size in sizes:
+        for kind, hosts in host_lists(size):
+            expected, dt, peak = measure(hostlist.collect_hostlist, hosts)
+            rows.append((len(hosts), f"collect_hostlist {kind}", dt, peak))
+            result, dt, peak = measure(hostlist.collect_hostlist_grouped, hosts)
+            rows.append((len(hosts), f"collect_hostlist_grouped {kind}", dt, peak))
+            assert result == expected, f"results differ for {kind} ({size})"
+    report("Hostlist collection", rows)
+
+
+def bench_fast_path(sizes, repeats=10):
+    rows = []
+    for size in sizes:
+        nodelist = "rack[1-%d]cn[01-64]" % max(size // 64, 1)
+        tasks = "4(x%d),2" % size
+        hostlist.MAX_SIZE = max(hostlist.MAX_SIZE, size)
+
+        def parse(expand, parse_tasks):
+            for _ in range(repeats):
+                expand(nodelist)
+                parse_tasks(tasks)
+
+        _, dt, peak = measure(
+            parse, hostlist.expand_hostlist, hostlist.parse_slurm_tasks_per_node
+        )
+        rows.append((size, f"parse x{repeats}", dt, peak))
+        _, dt, peak = measure(
+            parse,
+            hostlist.expand_hostlist_cached,
+            hostlist.parse_slurm_tasks_per_node_cached,
+        )
+        rows.append((size, f"parse cached x{repeats}", dt, peak))
+
+        # Perflog-like host names, a few distinct hosts repeated many times
+        rng = random.Random(42)
+        names = ["cn%02d" % i for i in range(1, 200)] + [
+            "gpu%02d" % i for i in range(1, 20)
+        ]
+        hosts = [rng.choice(names) for _ in range(size)]
+        expected, dt, peak = measure(
+            lambda: sorted(hosts, key=hostlist.numeric_sort_key)
+        )
+        rows.append((size, "sorted(key=numeric_sort_key)", dt, peak))
+        result, dt, peak = measure(hostlist.numerically_sorted, hosts)
+        rows.append((size, "numerically_sorted", dt, peak))
+        assert result == expected, f"sort results differ ({size})"
+    report("Fast path", rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[10000, 100000, 1000000],
+        help="number of hosts in the benchmarked node lists",
+    )
+    args = parser.parse_args()
+
+    bench_expand(args.sizes)
+    bench_collect(args.sizes)
+    bench_fast_path(args.sizes)
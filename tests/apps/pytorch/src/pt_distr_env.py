@@ -1,8 +1,15 @@
 import os
+import torch.distributed as dist
 import hostlist
 
 
 class DistributedEnviron:
+    # The master port is derived from the job ID, so that concurrent jobs
+    # sharing a node do not collide. Outside of a job the default is used.
+    default_master_port = 39591
+    master_port_base = 20000
+    master_port_range = 40000
+
     def __init__(self):
         self._setup_distr_env()
         self.master_addr = os.environ["MASTER_ADDR"]
@@ -11,14 +18,121 @@ class DistributedEnviron:
         self.rank = int(os.environ["RANK"])
         self.local_rank = int(os.environ["LOCAL_RANK"])
 
+        self.hostnames, self.node_ranks = self._setup_node_ranks()
+        self.num_nodes = len(self.node_ranks)
+        self.node_id = next(
+            i for i, ranks in enumerate(self.node_ranks) if self.rank in ranks
+        )
+        self.hostname = self.hostnames[self.node_id]
+
+        # Created by init_process_groups()
+        self.intra_node_group = None
+        self.inter_node_group = None
+
     def _setup_distr_env(self):
-        hostnames = hostlist.expand_hostlist(os.environ["SLURM_JOB_NODELIST"])
+        # Only the first host is needed, no need to expand the whole list
+        hostnames = hostlist.HostList(os.environ["SLURM_JOB_NODELIST"])
         os.environ["MASTER_ADDR"] = hostnames[0]
-        os.environ["MASTER_PORT"] = "39591"
+        os.environ["MASTER_PORT"] = str(self._master_port())
         os.environ["WORLD_SIZE"] = os.environ["SLURM_NTASKS"]
         os.environ["RANK"] = os.environ["SLURM_PROCID"]
         os.environ["LOCAL_RANK"] = os.environ["SLURM_LOCALID"]
 
+    def _master_port(self):
+        job_id = os.environ.get("SLURM_JOB_ID")
+        if job_id is None:
+            return self.default_master_port
+
+        return self.master_port_base + int(job_id) % self.master_port_range
+
+    def _setup_node_ranks(self):
+        """Map every node of the job to the ranks it runs.
+
+        Ranks are placed on the nodes in blocks (--distribution=block), so
+        the first node runs ranks 0..n0-1, the second n0..n0+n1-1 etc.
+        """
+
+        # Expanded lazily, a rank only looks up the name of its own node
+        hostnames = hostlist.HostList(os.environ["SLURM_JOB_NODELIST"])
+        tasks_per_node = hostlist.parse_slurm_tasks_per_node_cached(
+            os.environ["SLURM_TASKS_PER_NODE"]
+        )
+        if len(hostnames) != len(tasks_per_node):
+            raise RuntimeError(
+                f"SLURM_TASKS_PER_NODE lists {len(tasks_per_node)} nodes, "
+                f"but SLURM_JOB_NODELIST has {len(hostnames)}"
+            )
+
+        if sum(tasks_per_node) != self.world_size:
+            raise RuntimeError(
+                f"SLURM_TASKS_PER_NODE adds up to {sum(tasks_per_node)} tasks, "
+                f"but the world size is {self.world_size}"
+            )
+
+        node_ranks = []
+        first_rank = 0
+        for num_tasks in tasks_per_node:
+            node_ranks.append(range(first_rank, first_rank + num_tasks))
+            first_rank += num_tasks
+
+        return hostnames, node_ranks
+
+    def init_process_groups(self):
+        """Create the intra-node and the inter-node process groups.
+
+        The intra-node group holds all ranks of this rank's node, the
+        inter-node group the ranks with the same local rank on every node.
+        Every rank has to call this after dist.init_process_group(), since
+        all ranks take part in the creation of every group.
+        """
+
+        for ranks in self.node_ranks:
+            group = dist.new_group(list(ranks))
+            if self.rank in ranks:
+                self.intra_node_group = group
+
+        max_tasks_per_node = max(len(ranks) for ranks in self.node_ranks)
+        for local_rank in range(max_tasks_per_node):
+            ranks = [
+                node_ranks[local_rank]
+                for node_ranks in self.node_ranks
+                if local_rank < len(node_ranks)
+            ]
+            group = dist.new_group(ranks)
+            if self.rank in ranks:
+                self.inter_node_group = group
+
+    def hierarchical_all_reduce(self, tensor, async_op=False):
+        """Sum a tensor over all ranks, crossing nodes once per node.
+
+        The tensor is first reduced to the first rank of each node, these
+        ranks then all-reduce it across the nodes and finally broadcast the
+        result within their node. Only one rank per node sends data over
+        the interconnect.
+
+        The collectives are issued in the same order on every rank, from the
+        calling thread: the reduce and the all-reduce are waited for before
+        the next one is issued. Chaining them on the completion callbacks of
+        the process group instead lets them interleave with the collectives
+        of the next DDP bucket on the same group, which deadlocks. With
+        async_op the broadcast is left in flight and the future of the
+        summed tensor is returned, as a DDP communication hook needs.
+        """
+
+        node_leader = self.node_ranks[self.node_id][0]
+        dist.reduce(tensor, node_leader, group=self.intra_node_group)
+        if self.rank == node_leader:
+            dist.all_reduce(tensor, group=self.inter_node_group)
+
+        work = dist.broadcast(
+            tensor, node_leader, group=self.intra_node_group, async_op=True
+        )
+        if async_op:
+            return work.get_future().then(lambda fut: tensor)
+
+        work.wait()
+        return tensor
+
 
 if __name__ == "__main__":
     distr_env = DistributedEnviron()
@@ -27,3 +141,5 @@ if __name__ == "__main__":
     print("world size  :", distr_env.world_size)
     print("rank        :", distr_env.rank)
     print("local rank  :", distr_env.local_rank)
+    print("node        :", f"{distr_env.hostname} ({distr_env.node_id})")
+    print("node ranks  :", distr_env.node_ranks[distr_env.node_id])
@@ -0,0 +1,23 @@
+# Copyright 2016-2022 Swiss National Supercomputing Centre (CSCS/ETH Zurich)
+# ReFrame Project Developers. See the top-level LICENSE file for details.
+#
+# SPDX-License-Identifier: BSD-3-Clause
+
+import os
+
+import reframe as rfm
+import reframe.utility.sanity as sn
+
+
+class build_benchio(rfm.CompileOnlyRegressionTest):
+    """benchio build shared by the benchio tests of an environment."""
+
+    descr = "benchio build"
+    build_system = "CMake"
+    modules = ["CMake/3.24.3-GCCcore-12.2.0"]
+
+    @sanity_function
+    def validate_build(self):
+        return sn.assert_true(
+            sn.path_isfile(os.path.join(self.stagedir, "src/benchio"))
+        )
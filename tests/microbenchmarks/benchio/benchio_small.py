@@ -6,11 +6,17 @@
 import reframe as rfm
 import reframe.utility.sanity as sn
 import os
+import sys
 import contextlib
 
+sys.path.append(os.path.dirname(__file__))
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "..", "mixins"))
+from benchio_build import build_benchio  # noqa: E402
+from topology import TopologyMixin  # noqa: E402
+
 
 @rfm.simple_test
-class benchioSmallTest(rfm.RegressionTest):
+class benchioSmallTest(rfm.RunOnlyRegressionTest, TopologyMixin):
     valid_systems = ["cyclone:cpu"]
     valid_prog_environs = ["PrgEnv-gnu-nocuda"]
     num_nodes = parameter([1, 2])
@@ -23,14 +29,7 @@ class benchioSmallTest(rfm.RegressionTest):
         loggable=True,
     )
     exclusive_access = True
-
-    # Number of cores for each system
-    cores = variable(
-        dict,
-        value={
-            "cyclone:cpu": 40,
-        },
-    )
+    benchio_binaries = fixture(build_benchio, scope="environment")
 
     allref = {
         "nvme": {
@@ -63,8 +62,6 @@ class benchioSmallTest(rfm.RegressionTest):
         self.prerun_cmds = ["source create_striped_dirs.sh"]
         self.postrun_cmds = ["source delete_dirs.sh"]
         self.time_limit = "9m"
-        self.build_system = "CMake"
-        self.modules = ["CMake/3.24.3-GCCcore-12.2.0"]
         self.perf_patterns = {
             "unstriped_mpiio": sn.extractsingle(
                 r"Writing to unstriped/mpiio\.dat\W*\n\W*time\W*=\W*\d+.\d*\W*,\W*rate\W*=\W*(\d+.\d*)",
@@ -86,11 +83,11 @@ class benchioSmallTest(rfm.RegressionTest):
     def setup_run(self):
         stagedir_name = os.path.split(self.stagedir)[-1]
         self.env_vars["WRITE_DIR"] = os.path.join(self.benchmark_info[1], stagedir_name)
-        self.executable = self.stagedir + "/src/benchio"
+        self.executable = os.path.join(self.benchio_binaries.stagedir, "src/benchio")
 
     @run_before("run")
     def setup_resources(self):
-        self.num_tasks_per_node = self.cores.get(self.current_partition.fullname, 1)
+        self.num_tasks_per_node = self.num_cores_per_node
         self.num_tasks = self.num_tasks_per_node * self.num_nodes
         self.num_cpus_per_task = 1
 
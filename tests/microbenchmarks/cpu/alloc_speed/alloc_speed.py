@@ -3,12 +3,18 @@
 #
 # SPDX-License-Identifier: BSD-3-Clause
 
+import os
+import sys
+
 import reframe as rfm
 import reframe.utility.sanity as sn
 
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "..", "..", "mixins"))
+from build_cache import BuildCacheMixin  # noqa: E402
+
 
 @rfm.simple_test
-class AllocSpeedTest(rfm.RegressionTest):
+class AllocSpeedTest(rfm.RegressionTest, BuildCacheMixin):
     sourcepath = "alloc_speed.cpp"
     valid_systems = ["cyclone:cpu"]
     valid_prog_environs = ["PrgEnv-gnu-nocuda"]
@@ -3,19 +3,26 @@
 #
 # SPDX-License-Identifier: BSD-3-Clause
 
+import os
+import sys
+
 import reframe as rfm
 import reframe.utility.sanity as sn
 import contextlib
 
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "..", "..", "mixins"))
+from build_cache import BuildCacheMixin  # noqa: E402
+from calibrated_reference import CalibratedReferenceMixin  # noqa: E402
+from node_sweep import NodeSweepMixin, discover_nodes  # noqa: E402
+from topology import TopologyMixin  # noqa: E402
 
-@rfm.simple_test
-class DGEMMTestCycloneCPU(rfm.RegressionTest):
+
+class DGEMMBaseCycloneCPU(
+    rfm.RegressionTest, CalibratedReferenceMixin, BuildCacheMixin, TopologyMixin
+):
     descr = "DGEMM performance test"
     sourcepath = "dgemm.c"
 
-    # TODO: Generalize this to use a list with all available nodes
-    node_id = parameter(["cn02", "cn03", "cn04"])
-
     # the perf patterns are automaticaly generated inside sanity
     perf_patterns = {}
     valid_systems = ["cyclone:cpu"]
@@ -38,13 +45,6 @@ class DGEMMTestCycloneCPU(rfm.RegressionTest):
         },
     }
 
-    cores = variable(
-        dict,
-        value={
-            "cyclone:cpu": 40,
-        },
-    )
-
     maintainers = ["cstyl"]
     tags = {"benchmark", "diagnostic", "maintenance"}
 
@@ -53,9 +53,11 @@ class DGEMMTestCycloneCPU(rfm.RegressionTest):
         envname = self.current_environ.name
 
         try:
-            self.reference = self.flops_reference[envname]
+            reference = self.flops_reference[envname]
         except KeyError:
-            self.reference = self.flops_reference["PrgEnv-gnu-nompi-nocuda"]
+            reference = self.flops_reference["PrgEnv-gnu-nompi-nocuda"]
+
+        self.reference = self.calibrated_reference(envname, reference)
 
     @run_before("compile")
     def set_compile_flags(self):
@@ -89,7 +91,7 @@ class DGEMMTestCycloneCPU(rfm.RegressionTest):
 
     @run_before("run")
     def prepare_run(self):
-        self.num_cpus_per_task = self.cores.get(self.current_partition.fullname, 1)
+        self.num_cpus_per_task = self.num_cores_per_node
         self.env_vars = {
             "OMP_NUM_THREADS": str(self.num_cpus_per_task),
             "OMP_BIND": "cores",
@@ -97,6 +99,14 @@ class DGEMMTestCycloneCPU(rfm.RegressionTest):
             "OMP_SCHEDULE": "static",
             "KMP_AFFINITY": "granularity=fine,compact",
         }
+
+
+@rfm.simple_test
+class DGEMMTestCycloneCPU(DGEMMBaseCycloneCPU):
+    node_id = parameter(discover_nodes("cpu", fallback=["cn02", "cn03", "cn04"]))
+
+    @run_before("run")
+    def set_node(self):
         self.job.options = [f"--nodelist={self.node_id}"]
 
     @sanity_function
@@ -126,3 +136,22 @@ class DGEMMTestCycloneCPU(rfm.RegressionTest):
         }
 
         return True
+
+
+@rfm.simple_test
+class DGEMMSweepCycloneCPU(DGEMMBaseCycloneCPU, NodeSweepMixin):
+    descr = "DGEMM performance test on every node of one allocation"
+    perf_patterns = None
+
+    @sanity_function
+    def validate(self):
+        return self.assert_every_node(r"\S+:\s+Time for \d+ DGEMM operations")
+
+    @run_before("performance")
+    def set_perf_variables(self):
+        self.set_node_performance(
+            "flops",
+            r"\S+:\s+Avg\. performance\s+:\s+(?P<value>\S+)\sGflop/s",
+            "Gflop/s",
+            self.reference.get(f"{self.current_partition.fullname}:flops"),
+        )
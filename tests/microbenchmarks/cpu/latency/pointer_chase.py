@@ -0,0 +1,115 @@
+import os
+import sys
+
+import reframe as rfm
+import reframe.utility.sanity as sn
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "..", "..", "mixins"))
+from build_cache import BuildCacheMixin  # noqa: E402
+from calibrated_reference import CalibratedReferenceMixin  # noqa: E402
+from topology import TopologyMixin  # noqa: E402
+from working_set import cache_level, plateau_median, size_label  # noqa: E402
+
+# Bytes of the chased lines, from a half of L1 to 1 GiB in steps of sqrt(2)
+WORKING_SETS = [int(2 ** (i / 2)) // 64 * 64 for i in range(28, 61)]
+
+
+class build_pointer_chase(rfm.CompileOnlyRegressionTest, BuildCacheMixin):
+    descr = "Pointer chase build"
+    build_system = "SingleSource"
+    sourcepath = "pointer_chase.c"
+    executable = "pointer_chase"
+
+    @run_before("compile")
+    def set_build_flags(self):
+        self.build_system.cflags = ["-O2"]
+
+    @sanity_function
+    def validate_build(self):
+        return sn.assert_true(
+            sn.path_isfile(os.path.join(self.stagedir, self.executable))
+        )
+
+
+@rfm.simple_test
+class PointerChaseLatencyCycloneCPU(
+    rfm.RunOnlyRegressionTest, CalibratedReferenceMixin, TopologyMixin
+):
+    """Memory latency of a single core by pointer chasing.
+
+    The cache lines of every working set are linked in a random cycle and
+    followed one dependent load after the other, on the cores of the first
+    NUMA node with the memory on the same (local) or on the last (remote)
+    NUMA node, with base pages or with transparent huge pages. It reports
+    the latency at every working set (e.g. latency_45.3MiB) and at the
+    plateau of every cache level and of DRAM (e.g. latency_L2), in ns per
+    load. The references are calibrated from the perflogs.
+    """
+
+    descr = "Pointer chase memory latency"
+    valid_systems = ["cyclone:cpu"]
+    valid_prog_environs = ["PrgEnv-gnu-nocuda"]
+    numa_placement = parameter(["local", "remote"])
+    huge_pages = parameter([False, True])
+    pointer_chase = fixture(build_pointer_chase, scope="environment")
+    num_tasks = 1
+    num_tasks_per_node = 1
+    use_multithreading = False
+    exclusive_access = True
+    time_limit = "10m"
+
+    maintainers = ["cstyl"]
+    tags = {"benchmark", "diagnostic", "performance"}
+
+    @run_after("setup")
+    def set_placement(self):
+        num_numa_nodes = self.topology["num_numa_nodes"]
+        self.skip_if(
+            self.numa_placement == "remote" and num_numa_nodes < 2,
+            "a single NUMA node has no remote memory",
+        )
+        self.mem_node = 0 if self.numa_placement == "local" else num_numa_nodes - 1
+
+        # The task has the whole node, numactl binds it to a core's NUMA node
+        self.num_cpus_per_task = self.num_cores_per_node
+        self.levels = [
+            cache_level(working_set, self.topology, 1) for working_set in WORKING_SETS
+        ]
+
+    @run_before("run")
+    def set_executable(self):
+        self.executable = "numactl"
+        self.executable_opts = [
+            "--cpunodebind=0",
+            f"--membind={self.mem_node}",
+            os.path.join(self.pointer_chase.stagedir, self.pointer_chase.executable),
+            *(["-H"] if self.huge_pages else []),
+            *map(str, WORKING_SETS),
+        ]
+
+    @sanity_function
+    def assert_every_size(self):
+        sizes = sn.extractall(r"^Working set: (\d+) bytes", self.stdout, 1, int)
+        return sn.all(
+            [
+                sn.assert_eq(sizes, WORKING_SETS),
+                sn.assert_found(r"^Pointer chase complete", self.stdout),
+            ]
+        )
+
+    @run_before("performance")
+    def set_perf_variables(self):
+        latencies = sn.extractall(
+            r"^Working set: \d+ bytes, latency: (\S+) ns/load", self.stdout, 1, float
+        )
+        self.perf_variables = {}
+        for i, working_set in enumerate(WORKING_SETS):
+            self.perf_variables[f"latency_{size_label(working_set)}"] = (
+                sn.make_performance_function(sn.getitem(latencies, i), "ns")
+            )
+
+        for level in ("L1", "L2", "L3", "DRAM"):
+            if level in self.levels:
+                self.perf_variables[f"latency_{level}"] = sn.make_performance_function(
+                    plateau_median(latencies, self.levels, level), "ns"
+                )
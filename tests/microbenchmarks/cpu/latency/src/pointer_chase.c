@@ -0,0 +1,172 @@
+/*
+ * Memory latency by pointer chasing.
+ *
+ * For every working set given on the command line, the cache lines of a
+ * buffer of that size are linked in a single cycle in a random order and
+ * the cycle is followed one dependent load after the other. Neither the
+ * out-of-order core nor the prefetchers can overlap the loads, so the time
+ * of a load is the latency of the level of the memory hierarchy that holds
+ * the working set.
+ *
+ * Usage: pointer_chase [-H] BYTES...
+ *   -H  back the buffers with transparent huge pages, otherwise they are
+ *       backed by base pages
+ *
+ * The memory and the cores are placed by the caller, e.g. with numactl.
+ */
+
+#define _GNU_SOURCE
+#include <stdint.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <sys/mman.h>
+#include <time.h>
+#include <unistd.h>
+
+#define LINE_SIZE 64
+#define HUGE_PAGE_SIZE (2UL << 20)
+
+/* Loads of a timed walk and number of walks, the best one is reported */
+#define LOADS (1UL << 22)
+#define NTIMES 3
+
+struct line {
+  struct line* next;
+  char pad[LINE_SIZE - sizeof(struct line*)];
+};
+
+static uint64_t rng_state = 88172645463325252ULL;
+
+static uint64_t xorshift64(void) {
+  rng_state ^= rng_state << 13;
+  rng_state ^= rng_state >> 7;
+  rng_state ^= rng_state << 17;
+  return rng_state;
+}
+
+static double now(void) {
+  struct timespec ts;
+  clock_gettime(CLOCK_MONOTONIC, &ts);
+  return ts.tv_sec + 1e-9 * ts.tv_nsec;
+}
+
+static struct line* alloc_lines(size_t num_lines, int huge_pages) {
+  void* buffer;
+  size_t bytes = num_lines * sizeof(struct line);
+  if (posix_memalign(&buffer, HUGE_PAGE_SIZE, bytes) != 0) return NULL;
+
+#if defined(MADV_HUGEPAGE) && defined(MADV_NOHUGEPAGE)
+  /* Before the first touch, which decides the page size */
+  madvise(buffer, bytes, huge_pages ? MADV_HUGEPAGE : MADV_NOHUGEPAGE);
+#endif
+  return buffer;
+}
+
+/* Link the lines in a single cycle in a random order */
+static struct line* link_lines(struct line* lines, size_t num_lines) {
+  size_t* order = malloc(num_lines * sizeof(size_t));
+  size_t i;
+  if (order == NULL) return NULL;
+
+  for (i = 0; i < num_lines; i++) order[i] = i;
+
+  for (i = num_lines - 1; i > 0; i--) {
+    size_t j   = xorshift64() % (i + 1);
+    size_t tmp = order[i];
+    order[i]   = order[j];
+    order[j]   = tmp;
+  }
+
+  for (i = 0; i < num_lines; i++)
+    lines[order[i]].next = &lines[order[(i + 1) % num_lines]];
+
+  struct line* first = &lines[order[0]];
+  free(order);
+  return first;
+}
+
+/* Sixteen dependent loads, unrolled to keep the loop out of the timing */
+#define LOAD16 \
+  p = p->next; \
+  p = p->next; \
+  p = p->next; \
+  p = p->next; \
+  p = p->next; \
+  p = p->next; \
+  p = p->next; \
+  p = p->next; \
+  p = p->next; \
+  p = p->next; \
+  p = p->next; \
+  p = p->next; \
+  p = p->next; \
+  p = p->next; \
+  p = p->next; \
+  p = p->next;
+
+static struct line* chase(struct line* p, size_t loads) {
+  size_t i;
+  for (i = 0; i < loads; i += 16) {
+    LOAD16
+  }
+  return p;
+}
+
+int main(int argc, char** argv) {
+  int huge_pages = 0;
+  int opt, arg;
+
+  while ((opt = getopt(argc, argv, "H")) != -1) {
+    if (opt == 'H') {
+      huge_pages = 1;
+    } else {
+      fprintf(stderr, "Usage: %s [-H] BYTES...\n", argv[0]);
+      return 1;
+    }
+  }
+
+  if (optind == argc) {
+    fprintf(stderr, "Usage: %s [-H] BYTES...\n", argv[0]);
+    return 1;
+  }
+
+  printf("Huge pages: %s\n", huge_pages ? "transparent" : "none");
+  printf("Loads per walk: %lu, best of %d walks\n", LOADS, NTIMES);
+
+  for (arg = optind; arg < argc; arg++) {
+    size_t num_lines = strtoull(argv[arg], NULL, 10) / LINE_SIZE;
+    struct line* lines;
+    struct line* p;
+    double best = 0.0;
+    int k;
+
+    if (num_lines < 2) {
+      fprintf(stderr, "Working set of less than 2 lines: %s\n", argv[arg]);
+      return 1;
+    }
+
+    lines = alloc_lines(num_lines, huge_pages);
+    if (lines == NULL || (p = link_lines(lines, num_lines)) == NULL) {
+      fprintf(stderr, "Failed to allocate %zu lines\n", num_lines);
+      return 1;
+    }
+
+    /* Bring the working set into the caches and the TLB */
+    p = chase(p, num_lines < LOADS ? num_lines : LOADS);
+
+    for (k = 0; k < NTIMES; k++) {
+      double t = now();
+      p        = chase(p, LOADS);
+      t        = now() - t;
+      if (k == 0 || t < best) best = t;
+    }
+
+    /* The line reached keeps the walks from being optimized out */
+    printf("Working set: %zu bytes, latency: %.3f ns/load (%p)\n",
+           num_lines * LINE_SIZE, 1e9 * best / LOADS, (void*)p);
+    free(lines);
+  }
+
+  printf("Pointer chase complete\n");
+  return 0;
+}
@@ -125,6 +125,25 @@
 #define OFFSET 0
 #endif
 
+/*  STREAM_REPEAT runs each kernel that many times back to back in a timed
+ *         iteration, so that arrays that fit in cache are timed over many
+ *         more clock ticks than one pass takes. The kernels write an array
+ *         they do not read, a repeat gives the same results. The threads
+ *         are forked once per timed iteration and every thread repeats its
+ *         own chunk of the arrays. Set it on the compile line with, for
+ *         example, "-DSTREAM_REPEAT=1000".
+ */
+#ifndef STREAM_REPEAT
+#define STREAM_REPEAT 1
+#endif
+
+/* Keeps the compiler from merging the repeats of a kernel */
+#ifdef __GNUC__
+#define REPEAT_BARRIER() __asm__ __volatile__("" : : : "memory")
+#else
+#define REPEAT_BARRIER()
+#endif
+
 /*
  *	3) Compile the code with optimization.  Many compilers generate
  *       unreasonably bad code before the optimizer tightens things up.
@@ -205,7 +224,7 @@ extern int omp_get_num_threads();
 int main() {
   int quantum, checktick();
   int BytesPerWord;
-  int k;
+  int k, r;
   ssize_t j;
   STREAM_TYPE scalar;
   double t, times[4][NTIMES];
@@ -242,6 +261,8 @@ int main() {
          (3.0 * BytesPerWord) *
              ((double)STREAM_ARRAY_SIZE / 1024.0 / 1024. / 1024.));
   printf("Each kernel will be executed %d times.\n", NTIMES);
+  if (STREAM_REPEAT > 1)
+    printf(" Each execution repeats the kernel %d times.\n", STREAM_REPEAT);
   printf(" The *best* time for each kernel (excluding the first iteration)\n");
   printf(" will be used to compute the reported bandwidth.\n");
 
@@ -313,37 +334,53 @@ int main() {
   for (k = 0; k < NTIMES; k++) {
     times[0][k] = mysecond();
 #ifdef TUNED
-    tuned_STREAM_Copy();
+    for (r = 0; r < STREAM_REPEAT; r++) tuned_STREAM_Copy();
 #else
-#pragma omp parallel for
-    for (j = 0; j < STREAM_ARRAY_SIZE; j++) c[j] = a[j];
+#pragma omp parallel private(r)
+    for (r = 0; r < STREAM_REPEAT; r++) {
+#pragma omp for schedule(static) nowait
+      for (j = 0; j < STREAM_ARRAY_SIZE; j++) c[j] = a[j];
+      REPEAT_BARRIER();
+    }
 #endif
     times[0][k] = mysecond() - times[0][k];
 
     times[1][k] = mysecond();
 #ifdef TUNED
-    tuned_STREAM_Scale(scalar);
+    for (r = 0; r < STREAM_REPEAT; r++) tuned_STREAM_Scale(scalar);
 #else
-#pragma omp parallel for
-    for (j = 0; j < STREAM_ARRAY_SIZE; j++) b[j] = scalar * c[j];
+#pragma omp parallel private(r)
+    for (r = 0; r < STREAM_REPEAT; r++) {
+#pragma omp for schedule(static) nowait
+      for (j = 0; j < STREAM_ARRAY_SIZE; j++) b[j] = scalar * c[j];
+      REPEAT_BARRIER();
+    }
 #endif
     times[1][k] = mysecond() - times[1][k];
 
     times[2][k] = mysecond();
 #ifdef TUNED
-    tuned_STREAM_Add();
+    for (r = 0; r < STREAM_REPEAT; r++) tuned_STREAM_Add();
 #else
-#pragma omp parallel for
-    for (j = 0; j < STREAM_ARRAY_SIZE; j++) c[j] = a[j] + b[j];
+#pragma omp parallel private(r)
+    for (r = 0; r < STREAM_REPEAT; r++) {
+#pragma omp for schedule(static) nowait
+      for (j = 0; j < STREAM_ARRAY_SIZE; j++) c[j] = a[j] + b[j];
+      REPEAT_BARRIER();
+    }
 #endif
     times[2][k] = mysecond() - times[2][k];
 
     times[3][k] = mysecond();
 #ifdef TUNED
-    tuned_STREAM_Triad(scalar);
+    for (r = 0; r < STREAM_REPEAT; r++) tuned_STREAM_Triad(scalar);
 #else
-#pragma omp parallel for
-    for (j = 0; j < STREAM_ARRAY_SIZE; j++) a[j] = b[j] + scalar * c[j];
+#pragma omp parallel private(r)
+    for (r = 0; r < STREAM_REPEAT; r++) {
+#pragma omp for schedule(static) nowait
+      for (j = 0; j < STREAM_ARRAY_SIZE; j++) a[j] = b[j] + scalar * c[j];
+      REPEAT_BARRIER();
+    }
 #endif
     times[3][k] = mysecond() - times[3][k];
   }
@@ -364,7 +401,8 @@ int main() {
     avgtime[j] = avgtime[j] / (double)(NTIMES - 1);
 
     printf("%s%12.1f  %11.6f  %11.6f  %11.6f\n", label[j],
-           1.0E-06 * bytes[j] / mintime[j], avgtime[j], mintime[j], maxtime[j]);
+           1.0E-06 * STREAM_REPEAT * bytes[j] / mintime[j], avgtime[j],
+           mintime[j], maxtime[j]);
   }
   printf(HLINE);
 
@@ -0,0 +1,17 @@
+#!/bin/bash
+#
+# Run STREAM on the cores of every NUMA node with its arrays on every NUMA
+# node
+#
+# Usage: stream_numa.sh STREAM NUM_NUMA_NODES
+#   e.g. OMP_NUM_THREADS=20 stream_numa.sh ./stream 2
+
+stream=$1
+num_numa_nodes=$2
+
+for ((cpu_node = 0; cpu_node < num_numa_nodes; cpu_node++)); do
+    for ((mem_node = 0; mem_node < num_numa_nodes; mem_node++)); do
+        echo "STREAM NUMA run: cpu_node=${cpu_node} mem_node=${mem_node}"
+        numactl --cpunodebind=${cpu_node} --membind=${mem_node} "${stream}"
+    done
+done
@@ -0,0 +1,19 @@
+#!/bin/bash
+#
+# Run STREAM for every thread count with every binding policy
+#
+# Usage: stream_scaling.sh STREAM "THREAD_COUNTS" PROC_BIND/PLACES...
+#   e.g. stream_scaling.sh ./stream "1 2 4" close/cores spread/threads
+
+stream=$1
+thread_counts=$2
+shift 2
+
+for policy in "$@"; do
+    for num_threads in ${thread_counts}; do
+        echo "STREAM scaling run: threads=${num_threads}" \
+            "proc_bind=${policy%/*} places=${policy#*/}"
+        OMP_NUM_THREADS=${num_threads} OMP_PROC_BIND=${policy%/*} \
+            OMP_PLACES=${policy#*/} "${stream}"
+    done
+done
@@ -3,20 +3,55 @@
 #
 # SPDX-License-Identifier: BSD-3-Clause
 
+import os
+import sys
+
 import reframe as rfm
 import reframe.utility.sanity as sn
 
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "..", "..", "mixins"))
+from build_cache import BuildCacheMixin  # noqa: E402
+from calibrated_reference import CalibratedReferenceMixin  # noqa: E402
+from node_sweep import NodeSweepMixin, discover_nodes  # noqa: E402
+from topology import TopologyMixin  # noqa: E402
 
-@rfm.simple_test
-class StreamTestCycloneCPU(rfm.RegressionTest):
+# {variant: (environ, cflags)} of the code generation of the kernels: the
+# target ISA, the vector width and, with the Intel compilers, whether the
+# stores bypass the caches (non-temporal stores)
+BUILD_VARIANTS = {
+    "gnu-O3": ("PrgEnv-gnu-nocuda", ["-fopenmp", "-O3"]),
+    "gnu-native": ("PrgEnv-gnu-nocuda", ["-fopenmp", "-O3", "-march=native"]),
+    "gnu-native-ymm": (
+        "PrgEnv-gnu-nocuda",
+        ["-fopenmp", "-O3", "-march=native", "-mprefer-vector-width=256"],
+    ),
+    "gnu-native-zmm": (
+        "PrgEnv-gnu-nocuda",
+        ["-fopenmp", "-O3", "-march=native", "-mprefer-vector-width=512"],
+    ),
+    "intel-O3": ("PrgEnv-intel", ["-qopenmp", "-O3"]),
+    "intel-avx512": ("PrgEnv-intel", ["-qopenmp", "-O3", "-xCORE-AVX512"]),
+    "intel-avx512-zmm": (
+        "PrgEnv-intel",
+        ["-qopenmp", "-O3", "-xCORE-AVX512", "-qopt-zmm-usage=high"],
+    ),
+    "intel-avx512-nt-always": (
+        "PrgEnv-intel",
+        ["-qopenmp", "-O3", "-xCORE-AVX512", "-qopt-streaming-stores=always"],
+    ),
+    "intel-avx512-nt-never": (
+        "PrgEnv-intel",
+        ["-qopenmp", "-O3", "-xCORE-AVX512", "-qopt-streaming-stores=never"],
+    ),
+}
+
+
+class StreamBaseCycloneCPU(rfm.RegressionTest, BuildCacheMixin, TopologyMixin):
     """This test checks the stream test:
     Function    Best Rate MB/s  Avg time     Min time     Max time
     Triad:          13991.7     0.017174     0.017153     0.017192
     """
 
-    # TODO: Generalize this to use a list with all available nodes
-    node_id = parameter(["cn02", "cn06", "cn07"])
-
     def __init__(self):
         self.descr = "STREAM Benchmark"
         self.exclusive_access = True
@@ -34,10 +69,6 @@ class StreamTestCycloneCPU(rfm.RegressionTest):
         self.build_system = "SingleSource"
         self.num_tasks = 1
         self.num_tasks_per_node = 1
-        self.stream_cpus_per_task = {
-            "cyclone:cpu": 20,
-        }
-        self.env_vars = {"OMP_PLACES": "threads", "OMP_PROC_BIND": "spread"}
         self.sanity_patterns = sn.assert_found(
             r"Solution Validates: avg error less than", self.stdout
         )
@@ -71,10 +102,9 @@ class StreamTestCycloneCPU(rfm.RegressionTest):
 
     @run_after("setup")
     def prepare_test(self):
-        self.num_cpus_per_task = self.stream_cpus_per_task.get(
-            self.current_partition.fullname, 1
-        )
-        self.env_vars["OMP_NUM_THREADS"] = self.num_cpus_per_task
+        # The references are of a thread on every other core, spread over
+        # the sockets
+        self.bind_omp_threads(self.num_cores_per_node // 2, proc_bind="spread")
         envname = self.current_environ.name
 
         self.build_system.cflags = self.prgenv_flags.get(envname, ["-O3"])
@@ -84,6 +114,70 @@ class StreamTestCycloneCPU(rfm.RegressionTest):
         except KeyError:
             self.reference = self.stream_bw_reference["PrgEnv-gnu-nocuda"]
 
+
+@rfm.simple_test
+class StreamTestCycloneCPU(StreamBaseCycloneCPU):
+    node_id = parameter(discover_nodes("cpu", fallback=["cn02", "cn06", "cn07"]))
+
     @run_before("run")
     def setup_resources(self):
         self.job.options = [f"--nodelist={self.node_id}"]
+
+
+@rfm.simple_test
+class StreamBuildVariantCycloneCPU(StreamBaseCycloneCPU, CalibratedReferenceMixin):
+    """Runs STREAM built with every variant of BUILD_VARIANTS.
+
+    Every variant is a test of its own, with its own performance records
+    and calibrated references, so that the compilers and flags can be
+    compared on the same partition.
+    """
+
+    build_variant = parameter(list(BUILD_VARIANTS))
+
+    # -march=native has to see the processor of the compute nodes
+    build_locally = False
+
+    @run_after("init")
+    def set_variant_environ(self):
+        self.descr = f"STREAM Benchmark built with {self.build_variant}"
+        self.valid_prog_environs = [BUILD_VARIANTS[self.build_variant][0]]
+
+    @run_after("setup")
+    def set_variant_flags(self):
+        self.build_system.cflags = BUILD_VARIANTS[self.build_variant][1]
+
+        # The inline references are of gnu-O3, the other variants only have
+        # the ones calibrated from their own history
+        reference = self.reference if self.build_variant == "gnu-O3" else {}
+        self.reference = self.calibrated_reference(self.current_environ.name, reference)
+
+
+@rfm.simple_test
+class StreamSweepCycloneCPU(StreamBaseCycloneCPU, NodeSweepMixin):
+    """Runs STREAM on all nodes of the partition in a single allocation."""
+
+    @run_after("init")
+    def set_sweep_descr(self):
+        self.descr = "STREAM Benchmark on every node of one allocation"
+        self.perf_patterns = None
+
+    @run_after("setup")
+    def set_sweep_sanity(self):
+        self.sanity_patterns = self.assert_every_node(r"Solution Validates")
+
+    @run_before("performance")
+    def set_perf_variables(self):
+        reference = self.reference
+        for name, label in (
+            ("copy", "Copy"),
+            ("scale", "Scale"),
+            ("add", "Add"),
+            ("triad", "Triad"),
+        ):
+            self.set_node_performance(
+                name,
+                rf"{label}:\s+(?P<value>\S+)",
+                "MB/s",
+                reference.get(f"{self.current_partition.fullname}:{name}"),
+            )
@@ -0,0 +1,46 @@
+import os
+import sys
+
+import reframe as rfm
+import reframe.utility.sanity as sn
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "..", "..", "mixins"))
+from build_cache import BuildCacheMixin  # noqa: E402
+
+# Arrays above 2 GiB in total do not fit the default code model
+MAX_SMALL_MODEL_BYTES = 2**31 - 2**24
+
+
+class build_stream(rfm.CompileOnlyRegressionTest, BuildCacheMixin):
+    """STREAM built with arrays of array_size elements, each kernel repeated
+    repeat times in a timed iteration (see STREAM_REPEAT in src/stream.c)."""
+
+    descr = "STREAM build"
+    build_system = "SingleSource"
+    sourcepath = "stream.c"
+    executable = "stream"
+    array_size = variable(int, value=10000000)
+    repeat = variable(int, value=1)
+    prgenv_flags = variable(
+        dict,
+        value={
+            "PrgEnv-gnu-nocuda": ["-fopenmp", "-O3"],
+            "PrgEnv-intel": ["-qopenmp", "-O3"],
+        },
+    )
+
+    @run_before("compile")
+    def set_build_flags(self):
+        self.build_system.cflags = [
+            *self.prgenv_flags.get(self.current_environ.name, ["-O3"]),
+            f"-DSTREAM_ARRAY_SIZE={self.array_size}",
+            f"-DSTREAM_REPEAT={self.repeat}",
+        ]
+        if 3 * 8 * self.array_size > MAX_SMALL_MODEL_BYTES:
+            self.build_system.cflags.append("-mcmodel=medium")
+
+    @sanity_function
+    def validate_build(self):
+        return sn.assert_true(
+            sn.path_isfile(os.path.join(self.stagedir, self.executable))
+        )
@@ -0,0 +1,133 @@
+import os
+import statistics
+import sys
+
+import reframe as rfm
+import reframe.utility.sanity as sn
+
+sys.path.append(os.path.dirname(__file__))
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "..", "..", "mixins"))
+from calibrated_reference import CalibratedReferenceMixin  # noqa: E402
+from stream_build import build_stream  # noqa: E402
+from topology import TopologyMixin  # noqa: E402
+
+
+@sn.deferrable
+def pair_bandwidth(runs, cpu_node, mem_node):
+    """Return the triad bandwidth of the run on the cores of cpu_node with
+    the arrays on mem_node."""
+
+    return next(
+        bandwidth
+        for run_cpu_node, run_mem_node, bandwidth in runs
+        if (run_cpu_node, run_mem_node) == (cpu_node, mem_node)
+    )
+
+
+@sn.deferrable
+def locality_bandwidth(runs, local):
+    """Return the mean triad bandwidth of the local (cpu_node == mem_node)
+    or of the remote runs."""
+
+    return statistics.mean(
+        bandwidth
+        for cpu_node, mem_node, bandwidth in runs
+        if (cpu_node == mem_node) == local
+    )
+
+
+@rfm.simple_test
+class StreamNumaMatrixCycloneCPU(
+    rfm.RunOnlyRegressionTest, CalibratedReferenceMixin, TopologyMixin
+):
+    """STREAM triad bandwidth of every pair of NUMA nodes of the cores and
+    of the memory.
+
+    One job runs STREAM under numactl --cpunodebind/--membind for every
+    (cpu node, memory node) pair, with a thread on every core of the cpu
+    node. It reports the bandwidth matrix (e.g. triad_cpu0_mem1), the mean
+    local and remote bandwidths and their ratio. A slow link between the
+    sockets lowers the remote bandwidths, and a wrong sub-NUMA clustering
+    setting changes the number of NUMA nodes.
+    """
+
+    descr = "STREAM NUMA locality matrix"
+    valid_systems = ["cyclone:cpu"]
+    valid_prog_environs = ["PrgEnv-gnu-nocuda"]
+    stream_binary = fixture(
+        build_stream, scope="environment", variables={"array_size": 2**25}
+    )
+    num_tasks = 1
+    num_tasks_per_node = 1
+    use_multithreading = False
+    exclusive_access = True
+    time_limit = "20m"
+
+    maintainers = ["cstyl"]
+    tags = {"benchmark", "diagnostic", "performance"}
+
+    @run_after("setup")
+    def set_threads(self):
+        # The task has the whole node, numactl binds each run to a NUMA node
+        self.num_numa_nodes = self.topology["num_numa_nodes"]
+        self.bind_omp_threads(self.num_cores_per_node)
+        self.env_vars["OMP_NUM_THREADS"] = str(
+            self.num_cores_per_node // self.num_numa_nodes
+        )
+        self.reference = self.calibrated_reference(
+            self.current_environ.name, self.reference
+        )
+
+    @run_before("run")
+    def set_executable(self):
+        self.executable = "./stream_numa.sh"
+        self.executable_opts = [
+            os.path.join(self.stream_binary.stagedir, self.stream_binary.executable),
+            str(self.num_numa_nodes),
+        ]
+
+    def runs(self):
+        """The (cpu node, memory node, triad bandwidth) of every run."""
+
+        return sn.extractall(
+            r"^STREAM NUMA run: cpu_node=(\d+) mem_node=(\d+)\n"
+            r"(?:.*\n)*?Triad:\s+(\S+)",
+            self.stdout,
+            (1, 2, 3),
+            (int, int, float),
+        )
+
+    @sanity_function
+    def assert_every_pair(self):
+        num_runs = self.num_numa_nodes**2
+        return sn.all(
+            [
+                sn.assert_eq(sn.len(self.runs()), num_runs),
+                sn.assert_eq(
+                    sn.count(sn.findall(r"Solution Validates", self.stdout)),
+                    num_runs,
+                ),
+            ]
+        )
+
+    @run_before("performance")
+    def set_perf_variables(self):
+        self.perf_variables = {}
+        for cpu_node in range(self.num_numa_nodes):
+            for mem_node in range(self.num_numa_nodes):
+                self.perf_variables[f"triad_cpu{cpu_node}_mem{mem_node}"] = (
+                    sn.make_performance_function(
+                        pair_bandwidth(self.runs(), cpu_node, mem_node), "MB/s"
+                    )
+                )
+
+        local = locality_bandwidth(self.runs(), local=True)
+        self.perf_variables["triad_local"] = sn.make_performance_function(local, "MB/s")
+        if self.num_numa_nodes > 1:
+            remote = locality_bandwidth(self.runs(), local=False)
+            self.perf_variables["triad_remote"] = sn.make_performance_function(
+                remote, "MB/s"
+            )
+            self.perf_variables["local_remote_ratio"] = sn.make_performance_function(
+                local / remote, "ratio"
+            )
@@ -0,0 +1,155 @@
+import os
+import sys
+
+import reframe as rfm
+import reframe.utility.sanity as sn
+
+sys.path.append(os.path.dirname(__file__))
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "..", "..", "mixins"))
+from calibrated_reference import CalibratedReferenceMixin  # noqa: E402
+from stream_build import build_stream  # noqa: E402
+from topology import TopologyMixin  # noqa: E402
+
+# OMP_PROC_BIND/OMP_PLACES of the runs
+POLICIES = (
+    "close/cores",
+    "close/threads",
+    "spread/cores",
+    "spread/threads",
+    "master/cores",
+    "master/threads",
+)
+
+
+@sn.deferrable
+def peak_bandwidth(runs, policy, max_threads=None):
+    """Return the highest triad bandwidth of the runs of a policy, of at
+    most max_threads threads."""
+
+    return max(
+        bandwidth
+        for num_threads, proc_bind, places, bandwidth in runs
+        if f"{proc_bind}/{places}" == policy
+        and (max_threads is None or num_threads <= max_threads)
+    )
+
+
+@sn.deferrable
+def saturation_threads(runs, policy, fraction, max_threads=None):
+    """Return the fewest threads of a policy that reach fraction of its
+    peak bandwidth, the knee of the scaling curve."""
+
+    peak = peak_bandwidth(runs, policy, max_threads).evaluate()
+    return min(
+        num_threads
+        for num_threads, proc_bind, places, bandwidth in runs
+        if f"{proc_bind}/{places}" == policy
+        and (max_threads is None or num_threads <= max_threads)
+        and bandwidth >= fraction * peak
+    )
+
+
+@rfm.simple_test
+class StreamThreadScalingCycloneCPU(
+    rfm.RunOnlyRegressionTest, CalibratedReferenceMixin, TopologyMixin
+):
+    """STREAM triad bandwidth versus the number of threads and their binding.
+
+    One job runs STREAM with every number of threads from one to a thread
+    on every core, with every OMP_PROC_BIND (close, spread, master) and
+    OMP_PLACES (cores, threads) policy. For every policy it reports the
+    peak bandwidth and the saturation thread count, the fewest threads that
+    reach saturation_fraction of the peak. The close/cores runs of at most
+    a socket of threads give the peak bandwidth of a socket and its
+    saturation thread count. The whole curve is in the output.
+    """
+
+    descr = "STREAM thread count and binding scaling"
+    valid_systems = ["cyclone:cpu"]
+    valid_prog_environs = ["PrgEnv-gnu-nocuda"]
+    # Four times the L3 of a node and more, the arrays take 768 MiB
+    stream_binary = fixture(
+        build_stream, scope="environment", variables={"array_size": 2**25}
+    )
+    saturation_fraction = variable(float, value=0.9)
+    num_tasks = 1
+    num_tasks_per_node = 1
+    use_multithreading = False
+    exclusive_access = True
+    time_limit = "30m"
+
+    maintainers = ["cstyl"]
+    tags = {"benchmark", "diagnostic", "performance"}
+
+    @run_after("setup")
+    def set_threads(self):
+        # The runs set their own threads and binding in the cores of the job
+        self.bind_omp_threads(self.num_cores_per_node)
+        self.thread_counts = list(range(1, self.num_cores_per_node + 1))
+        self.reference = self.calibrated_reference(
+            self.current_environ.name, self.reference
+        )
+
+    @run_before("run")
+    def set_executable(self):
+        self.executable = "./stream_scaling.sh"
+        self.executable_opts = [
+            os.path.join(self.stream_binary.stagedir, self.stream_binary.executable),
+            f'"{" ".join(map(str, self.thread_counts))}"',
+            *POLICIES,
+        ]
+
+    def runs(self):
+        """The (threads, proc_bind, places, triad bandwidth) of every run."""
+
+        return sn.extractall(
+            r"^STREAM scaling run: threads=(\d+) proc_bind=(\w+) places=(\w+)\n"
+            r"(?:.*\n)*?Triad:\s+(\S+)",
+            self.stdout,
+            (1, 2, 3, 4),
+            (int, str, str, float),
+        )
+
+    @sanity_function
+    def assert_every_run(self):
+        num_runs = len(self.thread_counts) * len(POLICIES)
+        return sn.all(
+            [
+                sn.assert_eq(sn.len(self.runs()), num_runs),
+                sn.assert_eq(
+                    sn.count(sn.findall(r"Solution Validates", self.stdout)),
+                    num_runs,
+                ),
+            ]
+        )
+
+    @run_before("performance")
+    def set_perf_variables(self):
+        self.perf_variables = {}
+        for policy in POLICIES:
+            name = policy.replace("/", "_")
+            self.perf_variables[f"triad_peak_{name}"] = sn.make_performance_function(
+                peak_bandwidth(self.runs(), policy), "MB/s"
+            )
+            self.perf_variables[f"saturation_threads_{name}"] = (
+                sn.make_performance_function(
+                    saturation_threads(self.runs(), policy, self.saturation_fraction),
+                    "threads",
+                )
+            )
+
+        cores_per_socket = self.num_cores_per_socket
+        self.perf_variables["triad_peak_per_socket"] = sn.make_performance_function(
+            peak_bandwidth(self.runs(), "close/cores", cores_per_socket), "MB/s"
+        )
+        self.perf_variables["saturation_threads_per_socket"] = (
+            sn.make_performance_function(
+                saturation_threads(
+                    self.runs(),
+                    "close/cores",
+                    self.saturation_fraction,
+                    cores_per_socket,
+                ),
+                "threads",
+            )
+        )
@@ -0,0 +1,118 @@
+import os
+import shlex
+import sys
+
+import reframe as rfm
+import reframe.utility.sanity as sn
+
+sys.path.append(os.path.dirname(__file__))
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "..", "..", "mixins"))
+from calibrated_reference import CalibratedReferenceMixin  # noqa: E402
+from stream_build import build_stream  # noqa: E402
+from topology import TopologyMixin  # noqa: E402
+from working_set import cache_level, plateau_median, size_label  # noqa: E402
+
+# Total bytes of the three arrays, from a share of L1 per core to 8 GiB in
+# steps of sqrt(2)
+WORKING_SETS = [int(2 ** (i / 2)) // 24 * 24 for i in range(30, 67)]
+
+# Bytes moved by a kernel in a timed iteration, the arrays that fit in cache
+# repeat the kernel up to that
+BYTES_PER_TIMING = 2**30
+
+KERNELS = (("copy", "Copy"), ("scale", "Scale"), ("add", "Add"), ("triad", "Triad"))
+
+
+class build_stream_working_set(build_stream):
+    working_set = parameter(WORKING_SETS)
+
+    @run_after("init")
+    def set_array_size(self):
+        self.array_size = self.working_set // 24
+        self.repeat = max(1, BYTES_PER_TIMING // self.working_set)
+
+
+@rfm.simple_test
+class StreamWorkingSetCycloneCPU(
+    rfm.RunOnlyRegressionTest, CalibratedReferenceMixin, TopologyMixin
+):
+    """STREAM bandwidth versus the working set of the arrays.
+
+    STREAM is built for working sets from a share of L1 per core to 8 GiB
+    and every build runs in the same job, with a thread on every core. Each
+    kernel reports its bandwidth at every working set (e.g. triad_64MiB)
+    and at the plateau of every cache level and of DRAM (e.g. triad_L2),
+    detected on the curve. The references are calibrated from the perflogs.
+    """
+
+    descr = "STREAM bandwidth versus working set"
+    valid_systems = ["cyclone:cpu"]
+    valid_prog_environs = ["PrgEnv-gnu-nocuda", "PrgEnv-intel"]
+    sourcesdir = None
+    stream_binaries = fixture(
+        build_stream_working_set, scope="environment", action="join"
+    )
+    num_tasks = 1
+    num_tasks_per_node = 1
+    use_multithreading = False
+    exclusive_access = True
+    time_limit = "30m"
+
+    maintainers = ["cstyl"]
+    tags = {"benchmark", "diagnostic", "performance"}
+
+    @run_after("setup")
+    def set_threads(self):
+        self.bind_omp_threads(self.num_cores_per_node, proc_bind="spread")
+        self.levels = [
+            cache_level(working_set, self.topology, self.num_cores_per_node)
+            for working_set in WORKING_SETS
+        ]
+        self.reference = self.calibrated_reference(
+            self.current_environ.name, self.reference
+        )
+
+    @run_before("run")
+    def set_executable(self):
+        binaries = sorted(self.stream_binaries, key=lambda build: build.working_set)
+        self.executable = "bash"
+        self.executable_opts = [
+            "-c",
+            shlex.quote(
+                "; ".join(
+                    os.path.join(build.stagedir, build.executable) for build in binaries
+                )
+            ),
+        ]
+
+    @sanity_function
+    def assert_every_size(self):
+        sizes = sn.extractall(r"^Array size = (\d+)", self.stdout, 1, int)
+        return sn.all(
+            [
+                sn.assert_eq(sizes, [ws // 24 for ws in WORKING_SETS]),
+                sn.assert_eq(
+                    sn.count(sn.findall(r"Solution Validates", self.stdout)),
+                    len(WORKING_SETS),
+                ),
+            ]
+        )
+
+    @run_before("performance")
+    def set_perf_variables(self):
+        # The builds run in the order of WORKING_SETS
+        self.perf_variables = {}
+        for name, label in KERNELS:
+            bandwidths = sn.extractall(rf"^{label}:\s+(\S+)", self.stdout, 1, float)
+            for i, working_set in enumerate(WORKING_SETS):
+                self.perf_variables[f"{name}_{size_label(working_set)}"] = (
+                    sn.make_performance_function(sn.getitem(bandwidths, i), "MB/s")
+                )
+
+            for level in ("L1", "L2", "L3", "DRAM"):
+                if level in self.levels:
+                    self.perf_variables[f"{name}_{level}"] = (
+                        sn.make_performance_function(
+                            plateau_median(bandwidths, self.levels, level), "MB/s"
+                        )
+                    )
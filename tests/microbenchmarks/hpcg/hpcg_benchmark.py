@@ -4,9 +4,16 @@
 # SPDX-License-Identifier: BSD-3-Clause
 
 import os
+import sys
+
 import reframe as rfm
 import reframe.utility.sanity as sn
 
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "..", "mixins"))
+from calibrated_reference import CalibratedReferenceMixin  # noqa: E402
+from source_mirror import mirror_git_repo  # noqa: E402
+from topology import TopologyMixin  # noqa: E402
+
 
 class HPCGHookMixin(rfm.RegressionMixin):
     @run_before("run")
@@ -45,14 +52,50 @@ class HPCGHookMixin(rfm.RegressionMixin):
         self.num_tasks_per_node = ntasks_per_node
 
 
+class build_hpcg(rfm.CompileOnlyRegressionTest):
+    descr = "HPCG reference benchmark build"
+    build_system = "Make"
+    repo_url = variable(str, value="https://github.com/hpcg-benchmark/hpcg.git")
+
+    @run_before("compile")
+    def set_sourcesdir(self):
+        # A local checkout that builds without network access once cloned
+        self.sourcesdir = mirror_git_repo(self.repo_url, "hpcg")
+
+    @run_before("compile")
+    def set_build_opts(self):
+        self.build_system.options = ["arch=MPI_GCC_OMP"]
+
+    @sanity_function
+    def validate_build(self):
+        return sn.assert_true(sn.path_isfile(os.path.join(self.stagedir, "bin/xhpcg")))
+
+
+class build_hpcg_mkl(rfm.CompileOnlyRegressionTest):
+    descr = "HPCG benchmark Intel MKL implementation build"
+    build_system = "Make"
+    prebuild_cmds = [
+        "cp -R ${MKLROOT}/benchmarks/hpcg/* .",
+        "mv Make.CycloneCPU_Intel setup",
+        "./configure CycloneCPU_Intel",
+    ]
+
+    @sanity_function
+    def validate_build(self):
+        return sn.assert_true(
+            sn.path_isfile(os.path.join(self.stagedir, "bin/xhpcg_skx"))
+        )
+
+
 @rfm.simple_test
-class HPCGCheckRef(rfm.RegressionTest, HPCGHookMixin):
+class HPCGCheckRef(
+    rfm.RunOnlyRegressionTest, HPCGHookMixin, CalibratedReferenceMixin, TopologyMixin
+):
     descr = "HPCG reference benchmark"
     valid_systems = ["cyclone:cpu"]
     valid_prog_environs = ["PrgEnv-gnu-nocuda"]
-    build_system = "Make"
-    sourcesdir = "https://github.com/hpcg-benchmark/hpcg.git"
-    executable = "bin/xhpcg"
+    sourcesdir = None
+    hpcg_binaries = fixture(build_hpcg, scope="environment")
     executable_opts = ["--nx=104", "--ny=104", "--nz=104", "-t2"]
     # use glob to catch the output file suffix dependent on execution time
     output_file = sn.getitem(sn.glob("HPCG*.txt"), 0)
@@ -60,21 +103,14 @@ class HPCGCheckRef(rfm.RegressionTest, HPCGHookMixin):
     num_cpus_per_task = 1
     exclusive_access = True
 
-    cores = variable(
-        dict,
-        value={
-            "cyclone:cpu": 40,
-        },
-    )
-
     reference = {"cyclone:cpu": {"gflops": (23.73, -0.1, None, "Gflop/s")}}
 
     maintainers = ["cstyl"]
     tags = {"benchmark", "diagnostic", "maintenance", "performance"}
 
-    @run_before("compile")
-    def set_build_opts(self):
-        self.build_system.options = ["arch=MPI_GCC_OMP"]
+    @run_before("run")
+    def set_executable(self):
+        self.executable = os.path.join(self.hpcg_binaries.stagedir, "bin/xhpcg")
 
     @property
     @deferrable
@@ -83,12 +119,7 @@ class HPCGCheckRef(rfm.RegressionTest, HPCGHookMixin):
 
     @run_before("compile")
     def set_tasks(self):
-        # FIXME: Auto-detecting processor info for remote partition is currently problematic.
-        # See #2914 for more info - Hardcode values until is fixed
-        if self.current_partition.processor.num_cores:
-            self.num_tasks_per_node = self.current_partition.processor.num_cores
-        else:
-            self.num_tasks_per_node = self.cores.get(self.current_partition.fullname, 1)
+        self.num_tasks_per_node = self.num_cores_per_node
 
     @performance_function("Gflop/s")
     def gflops(self):
@@ -114,27 +145,17 @@ class HPCGCheckRef(rfm.RegressionTest, HPCGHookMixin):
 
 
 @rfm.simple_test
-class HPCGCheckMKL(rfm.RegressionTest, HPCGHookMixin):
+class HPCGCheckMKL(
+    rfm.RunOnlyRegressionTest, HPCGHookMixin, CalibratedReferenceMixin, TopologyMixin
+):
     descr = "HPCG benchmark Intel MKL implementation"
     valid_systems = ["cyclone:cpu"]
     valid_prog_environs = ["PrgEnv-intel"]
-    build_system = "Make"
-    prebuild_cmds = [
-        "cp -R ${MKLROOT}/benchmarks/hpcg/* .",
-        "mv Make.CycloneCPU_Intel setup",
-        "./configure CycloneCPU_Intel",
-    ]
-    executable = "bin/xhpcg_skx"
+    sourcesdir = None
+    hpcg_binaries = fixture(build_hpcg_mkl, scope="environment")
     executable_opts = ["--nx=104", "--ny=104", "--nz=104", "-t2"]
     exclusive_access = True
 
-    cores = variable(
-        dict,
-        value={
-            "cyclone:cpu": 40,
-        },
-    )
-
     num_tasks = 0
     env_vars = {
         "I_MPI_PMI_LIBRARY": "/usr/lib64/libpmi.so",
@@ -161,12 +182,13 @@ class HPCGCheckMKL(rfm.RegressionTest, HPCGHookMixin):
 
     @run_before("compile")
     def set_tasks(self):
-        if self.current_partition.processor.num_cores:
-            self.num_tasks_per_node = self.current_partition.processor.num_cores
-        else:
-            self.num_tasks_per_node = self.cores.get(self.current_partition.fullname, 1)
+        self.num_tasks_per_node = self.num_cores_per_node
         self.num_cpus_per_task = 1
 
+    @run_before("run")
+    def set_executable(self):
+        self.executable = os.path.join(self.hpcg_binaries.stagedir, "bin/xhpcg_skx")
+
     @performance_function("Gflop/s")
     def gflops(self):
         # since this is a flexible test, we divide the extracted
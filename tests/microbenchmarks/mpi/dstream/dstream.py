@@ -1,6 +1,12 @@
+import os
+import sys
+
 import reframe as rfm
 import reframe.utility.sanity as sn
 
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "..", "..", "mixins"))
+from topology import TopologyMixin  # noqa: E402
+
 
 # Distributed STREAM
 #
@@ -12,13 +18,25 @@ import reframe.utility.sanity as sn
 #
 
 
+class build_dstream(rfm.CompileOnlyRegressionTest):
+    descr = "DistributedStream build"
+    build_system = "Make"
+
+    @sanity_function
+    def validate_build(self):
+        return sn.assert_true(
+            sn.path_isfile(os.path.join(self.stagedir, "distributed_streams"))
+        )
+
+
 @rfm.simple_test
-class StreamTest(rfm.RegressionTest):
+class StreamTest(rfm.RunOnlyRegressionTest, TopologyMixin):
+    dstream_binaries = fixture(build_dstream, scope="environment")
+
     def __init__(self):
         self.valid_systems = ["cyclone:cpu"]
         self.valid_prog_environs = ["PrgEnv-gnu-nocuda"]
-        self.build_system = "Make"
-        self.executable = "distributed_streams"
+        self.sourcesdir = None
         self.use_multithreading = False
         self.sanity_patterns = sn.assert_found(r"Node Triad", self.stdout)
         self.perf_patterns = {
@@ -61,11 +79,8 @@ class StreamTest(rfm.RegressionTest):
         }
 
         # System specific settings
-        self.ntasks = {
-            "cyclone:cpu": 240,
-        }
-        self.ntasks_per_node = {
-            "cyclone:cpu": 40,
+        self.dstream_nodes = {
+            "cyclone:cpu": 6,
         }
         # These are the arguments to DistributedStream itself:
         #   arg1: number of elements in each array created. Should exceed the size of
@@ -81,13 +96,14 @@ class StreamTest(rfm.RegressionTest):
 
     @run_before("run")
     def set_num_threads(self):
-        num_tasks = self.ntasks.get(self.current_partition.fullname, 1)
-        self.num_tasks = num_tasks
-        num_tasks_per_node = self.ntasks_per_node.get(
-            self.current_partition.fullname, 1
-        )
-        self.num_tasks_per_node = num_tasks_per_node
+        # A task on every core of the nodes
+        num_nodes = self.dstream_nodes.get(self.current_partition.fullname, 1)
+        self.num_tasks_per_node = self.num_cores_per_node
+        self.num_tasks = num_nodes * self.num_tasks_per_node
         self.num_cpus_per_task = 1
         self.time_limit = "20m"
+        self.executable = os.path.join(
+            self.dstream_binaries.stagedir, "distributed_streams"
+        )
         args = self.args.get(self.current_partition.fullname, ["24000000", "10000"])
         self.executable_opts = args
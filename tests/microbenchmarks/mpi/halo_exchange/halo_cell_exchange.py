@@ -3,12 +3,21 @@
 #
 # SPDX-License-Identifier: BSD-3-Clause
 
+import os
+import sys
+
 import reframe as rfm
 import reframe.utility.sanity as sn
 
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "..", "..", "mixins"))
+from build_cache import BuildCacheMixin  # noqa: E402
+from calibrated_reference import CalibratedReferenceMixin  # noqa: E402
+
 
 @rfm.simple_test
-class HaloCellExchangeTest(rfm.RegressionTest):
+class HaloCellExchangeTest(
+    rfm.RegressionTest, CalibratedReferenceMixin, BuildCacheMixin
+):
     def __init__(self):
         self.sourcepath = "halo_cell_exchange.c"
         self.build_system = "SingleSource"
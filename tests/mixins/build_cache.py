@@ -0,0 +1,118 @@
+import hashlib
+import os
+import shutil
+import tempfile
+
+import reframe as rfm
+from reframe.core.buildsystems import SingleSource
+
+default_cache_dir = os.path.join(
+    os.environ.get("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache")),
+    "cyclone-reframe",
+    "builds",
+)
+
+
+class BuildCacheMixin(rfm.RegressionMixin):
+    """Reuse the executables of SingleSource builds across runs.
+
+    The executable of a build is stored under a hash of the source file, the
+    programming environment and its modules, the test's modules, the
+    partition and its processor architecture, for flags such as
+    -march=native, and the compile command, which holds the compiler and all
+    flags. A later build with the same hash links or copies the stored
+    executable into the stage directory instead of compiling,
+    build_cache_hit tells which happened.
+
+    The hash does not see changes inside a module of an unchanged name, run
+    with -S use_build_cache=false to compile everything after the compilers
+    or libraries are updated in place.
+    """
+
+    use_build_cache = variable(bool, value=True)
+    build_cache_dir = variable(
+        str, value=os.environ.get("RFM_CYCLONE_BUILD_CACHE", default_cache_dir)
+    )
+
+    @run_after("init")
+    def init_build_cache(self):
+        self.build_cache_hit = False
+
+    def build_cache_key(self):
+        """Return the cache key of the build, None if it is not cacheable."""
+
+        if not isinstance(self.build_system, SingleSource) or not isinstance(
+            self.sourcesdir, str
+        ):
+            return None
+
+        source = os.path.join(self.prefix, self.sourcesdir, self.sourcepath)
+        if not os.path.isfile(source):
+            return None
+
+        # The compile command of a fixed executable name, the key is the same
+        # for all tests that build the same executable
+        self.build_system.srcfile = self.sourcepath
+        self.build_system.executable = "a.out"
+        commands = self.build_system.emit_build_commands(self.current_environ)
+        self.build_system.executable = None
+
+        digest = hashlib.sha256()
+        with open(source, "rb") as fp:
+            digest.update(fp.read())
+
+        for item in (
+            self.current_environ.name,
+            self.current_partition.fullname,
+            self.current_partition.processor.arch or "",
+            *self.current_environ.modules,
+            *self.modules,
+            *commands,
+        ):
+            digest.update(b"\0" + item.encode())
+
+        return digest.hexdigest()
+
+    @run_before("compile", always_last=True)
+    def reuse_cached_build(self):
+        self.build_cache_path = None
+        if not self.use_build_cache:
+            return
+
+        key = self.build_cache_key()
+        if key is None:
+            return
+
+        self.build_cache_path = os.path.join(self.build_cache_dir, key[:2], key)
+        if not os.path.isfile(self.build_cache_path):
+            return
+
+        # Only copy the executable, the build commands of the test would run
+        # or time a build that does not happen
+        if not hasattr(self, "executable"):
+            self.executable = os.path.join(".", self.unique_name)
+
+        self.build_cache_hit = True
+        self.prebuild_cmds = []
+        self.postbuild_cmds = []
+        self.build_system = "CustomBuild"
+        self.build_system.commands = [
+            f"ln -f {self.build_cache_path} {self.executable} 2>/dev/null || "
+            f"cp {self.build_cache_path} {self.executable}"
+        ]
+
+    @run_before("run")
+    def store_build(self):
+        if self.build_cache_path is None or self.build_cache_hit:
+            return
+
+        executable = os.path.join(self.stagedir, self.executable)
+        if not os.path.isfile(executable):
+            return
+
+        # Copy and rename, so that concurrent builds never see a partial file
+        os.makedirs(os.path.dirname(self.build_cache_path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.build_cache_path))
+        os.close(fd)
+        shutil.copy2(executable, tmp_path)
+        os.replace(tmp_path, self.build_cache_path)
@@ -0,0 +1,65 @@
+import json
+import os
+
+import reframe as rfm
+from reframe.utility import ScopedDict
+
+
+class CalibratedReferenceMixin(rfm.RegressionMixin):
+    """Replace the inline references with calibrated ones.
+
+    The reference file is written by tools/perflog/perflog_calibrate.py
+    from the perflog history. Performance variables without a calibrated
+    reference keep their inline one, and without a reference file nothing
+    changes.
+    """
+
+    reference_file = variable(
+        str,
+        value=os.environ.get(
+            "RFM_CYCLONE_REFERENCES",
+            os.path.join(
+                os.path.dirname(__file__), "..", "..", "config", "references.json"
+            ),
+        ),
+    )
+
+    @run_after("init")
+    def load_calibrated_references(self):
+        # {environ: {"system:partition": {perf_var: (value, lower, upper, unit)}}}
+        self.calibrated_references = {}
+        if not os.path.exists(self.reference_file):
+            return
+
+        with open(self.reference_file) as fp:
+            references = json.load(fp)
+
+        # The perflogs name the test by its display name, the test name
+        # followed by " %param=value" for every parameter
+        name, _, params = self.display_name.partition(" ")
+        self.calibrated_references = references.get(name, {}).get(params, {})
+
+        # Tests of several environments pick their reference in setup
+        if len(self.valid_prog_environs) == 1:
+            self.reference = self.calibrated_reference(
+                self.valid_prog_environs[0], self.reference
+            )
+
+    def calibrated_reference(self, environ, reference):
+        """Return the reference updated with the calibrated values of the
+        environment."""
+
+        if not isinstance(reference, ScopedDict):
+            reference = ScopedDict(reference)
+
+        updated = {}
+        for key, value in reference.items():
+            partition, _, perf_var = key.rpartition(":")
+            updated.setdefault(partition, {})[perf_var] = value
+
+        calibrated = self.calibrated_references.get(environ, {})
+        for partition, perf_vars in calibrated.items():
+            for perf_var, value in perf_vars.items():
+                updated.setdefault(partition, {})[perf_var] = tuple(value)
+
+        return updated
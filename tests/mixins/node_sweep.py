@@ -0,0 +1,153 @@
+import os
+import re
+import statistics
+import subprocess
+
+import reframe as rfm
+import reframe.utility.sanity as sn
+from reframe.core.backends import getlauncher
+
+# Runs "$@" on every node of the allocation at once, one job step per node,
+# and prefixes every output line with the name of its node
+NODE_SWEEP_SCRIPT = """#!/bin/bash
+for node in $(scontrol show hostnames "$SLURM_JOB_NODELIST"); do
+    srun --nodes=1 --ntasks=1 --cpus-per-task="$SLURM_CPUS_PER_TASK" \\
+        --nodelist="$node" --exact "$@" 2>&1 | sed "s/^/$node: /" &
+done
+wait
+"""
+
+
+def _numeric_key(node):
+    return [int(s) if s.isdigit() else s for s in re.split(r"(\d+)", node)]
+
+
+def discover_nodes(partition, fallback=()):
+    """Return the responding nodes of a Slurm partition that can run jobs.
+
+    The nodes are listed by sinfo, or by the stand-in named by the
+    RFM_CYCLONE_SINFO environment variable (see sinfo_mock.sh). Without a
+    working sinfo the fallback nodes are returned.
+    """
+
+    sinfo = os.environ.get("RFM_CYCLONE_SINFO", "sinfo")
+    cmd = [
+        sinfo,
+        "--noheader",
+        "--Node",
+        "--responding",
+        f"--partition={partition}",
+        "--states=idle,mixed,allocated",
+        "--format=%N",
+    ]
+    try:
+        result = subprocess.run(
+            cmd, capture_output=True, text=True, check=True, timeout=60
+        )
+    except (OSError, subprocess.SubprocessError):
+        return list(fallback)
+
+    nodes = sorted(set(result.stdout.split()), key=_numeric_key)
+    return nodes or list(fallback)
+
+
+class NodeSweepMixin(rfm.RegressionMixin):
+    """Run a single-node benchmark on many nodes in one allocation.
+
+    The allocation has one task per node and the benchmark runs on every
+    node at once as a job step of its own, so that sweeping the partition
+    takes a single queue wait. Every output line is prefixed with the name
+    of its node, set_node_performance() turns them into one performance
+    variable per node and the statistics of their distribution.
+    """
+
+    # Nodes of the allocation, all nodes of the partition if 0
+    sweep_num_nodes = variable(int, value=0)
+
+    @run_after("setup")
+    def set_sweep_nodes(self):
+        num_nodes = self.sweep_num_nodes
+        if not num_nodes:
+            num_nodes = len(discover_nodes(self.current_partition.name)) or 1
+
+        self.num_tasks = num_nodes
+        self.num_tasks_per_node = 1
+
+    @run_before("run")
+    def run_on_every_node(self):
+        with open(os.path.join(self.stagedir, "node_sweep.sh"), "w") as fp:
+            fp.write(NODE_SWEEP_SCRIPT)
+
+        # The script starts the job steps itself
+        self.job.launcher = getlauncher("local")()
+        self.executable = f"bash node_sweep.sh {self.executable}"
+
+    def node_values(self, pattern):
+        """Return {node: value} of the output lines matching the pattern,
+        whose group "value" is the value of the node."""
+
+        return {
+            node: float(value)
+            for node, value in sn.evaluate(
+                sn.extractall(
+                    rf"^(?P<node>\S+): {pattern}",
+                    os.path.join(self.stagedir, self.job.stdout),
+                    ["node", "value"],
+                )
+            )
+        }
+
+    def assert_every_node(self, pattern):
+        """Assert that every node printed a line matching the pattern."""
+        nodes = sn.extractall(rf"^(?P<node>\S+): {pattern}", self.stdout, "node")
+        return sn.assert_eq(
+            sn.count_uniq(nodes),
+            sn.getattr(self, "num_tasks"),
+            msg="only {0} of {1} nodes reported a result",
+        )
+
+    def set_node_performance(self, name, pattern, unit, reference=None):
+        """Report the value of every node and their min, median, max and
+        coefficient of variation as performance variables.
+
+        The reference tuple applies to every node and to the minimum.
+        """
+
+        if self.is_dry_run():
+            return
+
+        values = self.node_values(pattern)
+        for node, value in values.items():
+            self.perf_variables[f"{name}_{node}"] = sn.make_performance_function(
+                sn.defer(value), unit
+            )
+
+        if not values:
+            return
+
+        stats = {
+            "min": min(values.values()),
+            "median": statistics.median(values.values()),
+            "max": max(values.values()),
+        }
+        for stat, value in stats.items():
+            self.perf_variables[f"{name}_{stat}"] = sn.make_performance_function(
+                sn.defer(value), unit
+            )
+
+        cv = 0.0
+        if len(values) > 1 and stats["median"]:
+            cv = (
+                100
+                * statistics.stdev(values.values())
+                / statistics.mean(values.values())
+            )
+
+        self.perf_variables[f"{name}_cv"] = sn.make_performance_function(
+            sn.defer(cv), "%"
+        )
+
+        if reference is not None:
+            partition = self.current_partition.fullname
+            for node in list(values) + ["min"]:
+                self.reference[f"{partition}:{name}_{node}"] = reference
@@ -0,0 +1,60 @@
+import math
+import os
+
+import reframe as rfm
+
+# Partitions that run the tests as job steps of the current allocation, by
+# the partition of the allocation
+PACKED_PARTITIONS = {"cyclone:cpu": "cyclone:cpu-packed"}
+
+
+class JobPackingMixin(rfm.RegressionMixin):
+    """Run a small test as a job step of a shared allocation.
+
+    A test that runs on the cpu partition can also run on cpu-packed, which
+    has the local scheduler and the srun launcher: ReFrame itself runs in an
+    allocation of the cpu partition and every test is a job step of it
+    instead of a job of its own. The steps only take the tasks, cores and
+    memory they ask for (srun --exact), so that Slurm runs as many of them
+    at once as the allocation fits and queues the rest. Every test keeps
+    its own stage directory, sanity and performance results. The packed
+    partitions are only valid when ReFrame runs in an allocation.
+    """
+
+    # Memory of every core of a step, without it a step takes all the memory
+    # of its nodes and the steps run one at a time
+    step_mem_per_cpu = variable(str, value="1G")
+
+    @run_after("init")
+    def add_packed_partitions(self):
+        # Outside an allocation the steps would run without one
+        if "SLURM_JOB_ID" not in os.environ:
+            return
+
+        self.valid_systems += [
+            PACKED_PARTITIONS[system]
+            for system in self.valid_systems
+            if system in PACKED_PARTITIONS
+        ]
+
+    @run_before("run")
+    def request_step_resources(self):
+        if self.current_partition.scheduler.registered_name != "local":
+            return
+
+        # The step requests what sbatch would have requested for the job
+        options = [f"--ntasks={self.num_tasks}"]
+        if self.num_tasks_per_node:
+            num_nodes = math.ceil(self.num_tasks / self.num_tasks_per_node)
+            options += [
+                f"--nodes={num_nodes}",
+                f"--ntasks-per-node={self.num_tasks_per_node}",
+            ]
+
+        # Older srun launchers leave out --cpus-per-task
+        use_cpus_per_task = getattr(self.job.launcher, "use_cpus_per_task", False)
+        if self.num_cpus_per_task and not use_cpus_per_task:
+            options.append(f"--cpus-per-task={self.num_cpus_per_task}")
+
+        options += ["--exact", f"--mem-per-cpu={self.step_mem_per_cpu}"]
+        self.job.launcher.options = options + self.job.launcher.options
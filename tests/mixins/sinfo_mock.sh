@@ -0,0 +1,15 @@
+#!/bin/bash
+# Stand-in for "sinfo --Node --format=%N" on machines without Slurm, lists
+# made-up nodes of the Cyclone partitions. Select it with
+# RFM_CYCLONE_SINFO=tests/mixins/sinfo_mock.sh
+partition=cpu
+for arg in "$@"; do
+    case $arg in
+        --partition=*) partition=${arg#--partition=} ;;
+    esac
+done
+
+case $partition in
+    cpu) seq -f "cn%02g" 1 17 ;;
+    gpu) seq -f "gpu%02g" 1 16 ;;
+esac
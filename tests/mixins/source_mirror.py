@@ -0,0 +1,48 @@
+import fcntl
+import os
+
+import reframe.utility.osext as osext
+from reframe.core.exceptions import SpawnedProcessError, SpawnedProcessTimeout
+from reframe.core.logging import getlogger
+
+default_mirror_dir = os.path.join(
+    os.environ.get("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache")),
+    "cyclone-reframe",
+    "sources",
+)
+
+
+def mirror_git_repo(url, name, mirror_dir=None, timeout=300):
+    """Return the path of a local checkout of a git repository.
+
+    The checkout lives in mirror_dir, the RFM_CYCLONE_SOURCE_MIRROR
+    directory by default, and is created on first use and brought up to date
+    on every later use. Without network access the checkout is used as it
+    is, so a mirror copied from another machine lets the builds run offline.
+    """
+
+    mirror_dir = mirror_dir or os.environ.get(
+        "RFM_CYCLONE_SOURCE_MIRROR", default_mirror_dir
+    )
+    path = os.path.join(mirror_dir, name)
+    os.makedirs(mirror_dir, exist_ok=True)
+
+    # Concurrent sessions update the checkout one at a time
+    with open(f"{path}.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if not os.path.isdir(os.path.join(path, ".git")):
+            osext.run_command(
+                f"git clone --quiet {url} {path}", check=True, timeout=timeout
+            )
+            return path
+
+        try:
+            osext.run_command(
+                f"git -C {path} pull --quiet --ff-only", check=True, timeout=timeout
+            )
+        except (SpawnedProcessError, SpawnedProcessTimeout) as err:
+            getlogger().warning(
+                f"could not update the source mirror {path}, using it as is: {err}"
+            )
+
+    return path
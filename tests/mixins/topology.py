@@ -0,0 +1,112 @@
+import reframe as rfm
+from reframe.core.logging import getlogger
+
+# The nodes of a partition when neither the configuration nor ReFrame's
+# auto-detection knows them: two 20-core Xeon Gold 6248 (Cascade Lake) with
+# AVX-512 on the cpu and gpu nodes. Run tools/topology/probe_topology.py to
+# record the actual topology in config/topology.
+FALLBACK_TOPOLOGY = {
+    "cyclone:cpu": {
+        "num_sockets": 2,
+        "num_cores": 40,
+        "num_cpus": 40,
+        "num_numa_nodes": 2,
+        "caches": {"L1": 32768, "L2": 1048576, "L3": 28835840},
+        "simd_width": 512,
+    },
+    "cyclone:gpu": {
+        "num_sockets": 2,
+        "num_cores": 40,
+        "num_cpus": 40,
+        "num_numa_nodes": 2,
+        "caches": {"L1": 32768, "L2": 1048576, "L3": 28835840},
+        "simd_width": 512,
+    },
+}
+
+
+# Partitions whose fallback topology was already reported
+_fallback_partitions = set()
+
+
+def partition_topology(partition, fallback=None):
+    """Return the topology of the nodes of a partition.
+
+    The topology has the numbers of sockets, cores, hardware threads (cpus)
+    and NUMA nodes of a node, the size of a cache of every level and the
+    SIMD width in bits. It comes from the processor info of the partition,
+    the probed one of config/topology or ReFrame's auto-detected one, and
+    from its simd_width extra, what is missing from the fallback. A warning
+    names the fields of a partition that are not probed, once per
+    partition, since a fallback that no longer matches the nodes sizes the
+    tests wrongly.
+    """
+
+    fallback = fallback or {}
+    processor = partition.processor
+    topology = {
+        "num_sockets": processor.num_sockets,
+        "num_cores": processor.num_cores,
+        "num_cpus": processor.num_cpus,
+        "num_numa_nodes": processor.num_numa_nodes,
+        "caches": {},
+        "simd_width": partition.extras.get("simd_width"),
+    }
+    for cache in (processor.topology or {}).get("caches", []):
+        size = topology["caches"].get(cache["type"], 0)
+        topology["caches"][cache["type"]] = max(size, cache["size"])
+
+    missing = [key for key, value in topology.items() if not value]
+    for key, value in fallback.items():
+        if not topology.get(key):
+            topology[key] = value
+
+    # A partition known to neither has single-core nodes
+    for key in ("num_sockets", "num_cores", "num_cpus", "num_numa_nodes"):
+        topology[key] = topology[key] or 1
+
+    if missing and partition.fullname not in _fallback_partitions:
+        _fallback_partitions.add(partition.fullname)
+        getlogger().warning(
+            f"the topology of {partition.fullname} is not probed, the tests "
+            f"use fallback values for {', '.join(missing)}: run "
+            f"tools/topology/probe_topology.py --partition {partition.name} "
+            f"on one of its nodes"
+        )
+
+    return topology
+
+
+class TopologyMixin(rfm.RegressionMixin):
+    """Size the tasks and threads of a test from the node topology.
+
+    After setup, self.topology is the partition_topology() of the current
+    partition, the hooks of the test can size tasks and threads from it and
+    bind them with bind_omp_threads().
+    """
+
+    fallback_topology = variable(dict, value=FALLBACK_TOPOLOGY)
+
+    @run_after("setup")
+    def set_topology(self):
+        self.topology = partition_topology(
+            self.current_partition,
+            self.fallback_topology.get(self.current_partition.fullname),
+        )
+
+    @property
+    def num_cores_per_node(self):
+        return self.topology["num_cores"]
+
+    @property
+    def num_cores_per_socket(self):
+        return self.topology["num_cores"] // self.topology["num_sockets"]
+
+    def bind_omp_threads(self, num_threads, proc_bind="close"):
+        """Give every task num_threads cores and bind an OpenMP thread to
+        each of them."""
+
+        self.num_cpus_per_task = num_threads
+        self.env_vars["OMP_NUM_THREADS"] = str(num_threads)
+        self.env_vars["OMP_PLACES"] = "cores"
+        self.env_vars["OMP_PROC_BIND"] = proc_bind
@@ -0,0 +1,89 @@
+import statistics
+
+import reframe.utility.sanity as sn
+
+
+def size_label(num_bytes):
+    """Return a working set in bytes as in the names of the performance
+    variables, e.g. 45.3MiB."""
+
+    for unit in ("B", "KiB", "MiB"):
+        if num_bytes < 1000:
+            return f"{num_bytes:.3g}{unit}"
+
+        num_bytes /= 1024
+
+    return f"{num_bytes:.3g}GiB"
+
+
+def cache_level(working_set, topology, num_threads):
+    """Return the memory level that holds the share of a working set of
+    every thread.
+
+    A thread's share of the L3 of its socket adds to its L2, the L3 of the
+    Xeon Scalable processors holds the lines evicted from L2.
+    """
+
+    caches = topology["caches"]
+    threads_per_socket = max(1, num_threads // topology["num_sockets"])
+    share = working_set / num_threads
+    if share <= caches.get("L1", 0):
+        return "L1"
+
+    if share <= caches.get("L2", 0):
+        return "L2"
+
+    if share <= caches.get("L2", 0) + caches.get("L3", 0) / threads_per_socket:
+        return "L3"
+
+    return "DRAM"
+
+
+def detect_plateaus(values, tolerance=0.1, min_points=2):
+    """Return the (first, last) indices of the plateaus of a curve.
+
+    A plateau is a run of consecutive points that are all within tolerance
+    of the median of the run, the runs are grown from the first point on.
+    """
+
+    plateaus = []
+    first = 0
+    while first < len(values):
+        last = first
+        while last + 1 < len(values):
+            run = values[first : last + 2]
+            median = statistics.median(run)
+            if any(abs(value - median) > tolerance * median for value in run):
+                break
+
+            last += 1
+
+        if last - first + 1 >= min_points:
+            plateaus.append((first, last))
+
+        first = last + 1
+
+    return plateaus
+
+
+@sn.deferrable
+def plateau_median(values, levels, level):
+    """Return the median value of the detected plateau of a memory level,
+    the widest one if several fall in it.
+
+    A plateau falls in the level of its middle point. Without a plateau in
+    the level, it is the median of the points of the level.
+    """
+
+    plateaus = [
+        (first, last)
+        for first, last in detect_plateaus(values)
+        if levels[(first + last) // 2] == level
+    ]
+    if plateaus:
+        first, last = max(plateaus, key=lambda plateau: plateau[1] - plateau[0])
+        return statistics.median(values[first : last + 1])
+
+    return statistics.median(
+        value for value, value_level in zip(values, levels) if value_level == level
+    )
@@ -3,14 +3,21 @@
 #
 # SPDX-License-Identifier: BSD-3-Clause
 
+import os
 import re
+import sys
+
 import reframe as rfm
 import reframe.utility.sanity as sn
 
 from reframe.core.logging import getlogger
 
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "mixins"))
+from build_cache import BuildCacheMixin  # noqa: E402
+from packing import JobPackingMixin  # noqa: E402
+
 
-class HelloWorldBaseTest(rfm.RegressionTest):
+class HelloWorldBaseTest(rfm.RegressionTest, JobPackingMixin, BuildCacheMixin):
     lang = parameter(["c", "cpp", "f90"])
     prgenv_flags = {}
     sourcepath = "hello_world"
@@ -25,6 +32,8 @@ class HelloWorldBaseTest(rfm.RegressionTest):
     valid_prog_environs = ["*"]
     reference = {"*": {"compilation_time": (60, None, 0.1, "s")}}
     exclusive_access = True
+    # The tests measure the compilation time, a cached build does not compile
+    use_build_cache = False
 
     maintainers = ["cstyl"]
     tags = {"diagnostic", "maintenance"}
@@ -86,6 +95,12 @@ class HelloWorldBaseTest(rfm.RegressionTest):
             )
         )
 
+    @run_before("performance")
+    def skip_compilation_time(self):
+        # A cached build of -S use_build_cache=true does not compile
+        if self.build_cache_hit:
+            del self.perf_variables["compilation_time"]
+
     @performance_function("s")
     def compilation_time(self):
         return (
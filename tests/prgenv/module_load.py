@@ -0,0 +1,141 @@
+import os
+import sys
+
+import reframe as rfm
+import reframe.core.runtime as rt
+import reframe.utility.sanity as sn
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "mixins"))
+from packing import PACKED_PARTITIONS  # noqa: E402
+
+
+def module_environs():
+    """Return {(environ, partition): (modules, C compiler)} of the
+    environments of the current system that load modules.
+
+    The load times depend on the filesystem and the load of the nodes, so
+    an environment is timed on every partition that offers it, leaving out
+    the packed ones that need an allocation.
+    """
+
+    environs = {}
+    for partition in rt.runtime().system.partitions:
+        if partition.fullname in PACKED_PARTITIONS.values():
+            continue
+
+        for environ in partition.environs:
+            if environ.modules:
+                environs[environ.name, partition.fullname] = (
+                    environ.modules,
+                    environ.cc,
+                )
+
+    return environs
+
+
+environs = module_environs()
+
+
+@rfm.simple_test
+class ModuleLoadLatencyTest(rfm.RunOnlyRegressionTest):
+    """Time the activation of every programming environment of the
+    configuration.
+
+    Every job of an environment starts by loading its modules, so slow
+    loads of Lmod on a busy filesystem add up over the suite. The modules
+    are loaded in a fresh login shell, first cold and then again after a
+    purge, followed by spider searches with and without the spider cache
+    and two invocations of the environment's C compiler.
+    """
+
+    # An environment and a partition that offers it
+    environ_partition = parameter(
+        sorted(environs), fmt=lambda environ_partition: "@".join(environ_partition)
+    )
+    # The test runs in an environment of few modules and times the loads of
+    # the parameter's environment in a shell of its own
+    valid_prog_environs = ["PrgEnv-gnu-nompi-nocuda"]
+    sourcesdir = "src/module_load"
+    num_tasks = 1
+    num_tasks_per_node = 1
+    num_warm_loads = variable(int, value=3)
+    time_limit = "10m"
+
+    reference = {
+        "*": {
+            "cold_load_time": (2.0, None, 0.5, "s"),
+            "warm_load_time": (0.5, None, 0.5, "s"),
+            "compiler_first_time": (5.0, None, 0.5, "s"),
+        }
+    }
+
+    maintainers = ["cstyl"]
+    tags = {"diagnostic", "maintenance"}
+
+    @run_after("init")
+    def set_environ(self):
+        self.environ, partition = self.environ_partition
+        self.modules_to_load, self.compiler = environs[self.environ_partition]
+        self.valid_systems = [partition]
+        self.descr = f"Module load latency of {self.environ} on {partition}"
+
+    @run_before("run")
+    def set_executable(self):
+        # env -i leaves the modules of the test out of the login shell
+        self.executable = "env"
+        self.executable_opts = [
+            "-i",
+            "HOME=$HOME",
+            "USER=$USER",
+            "bash",
+            "-l",
+            "module_load_latency.sh",
+            str(self.num_warm_loads),
+            self.compiler,
+            *self.modules_to_load,
+        ]
+
+    @sanity_function
+    def assert_loaded(self):
+        return sn.assert_found(
+            rf"Loaded modules: {' '.join(self.modules_to_load)}", self.stdout
+        )
+
+    def time_of(self, what):
+        return (
+            sn.extractsingle(rf"^{what} time \(ns\): (\d+)", self.stdout, 1, float)
+            * 1.0e-9
+        )
+
+    @performance_function("s")
+    def cold_load_time(self):
+        return self.time_of("Cold module load")
+
+    @performance_function("s")
+    def warm_load_time(self):
+        return self.time_of("Warm module load")
+
+    @performance_function("s")
+    def spider_first_time(self):
+        return self.time_of("First spider")
+
+    @performance_function("s")
+    def spider_time(self):
+        return self.time_of("Spider")
+
+    @performance_function("s")
+    def spider_uncached_time(self):
+        return self.time_of("Uncached spider")
+
+    @performance_function("x")
+    def spider_cache_speedup(self):
+        # About 1 when Lmod finds no valid spider cache
+        return self.time_of("Uncached spider") / self.time_of("Spider")
+
+    @performance_function("s")
+    def compiler_first_time(self):
+        return self.time_of("First compiler invocation")
+
+    @performance_function("s")
+    def compiler_warm_time(self):
+        return self.time_of("Compiler invocation")
@@ -3,12 +3,19 @@
 #
 # SPDX-License-Identifier: BSD-3-Clause
 
+import os
+import sys
+
 import reframe as rfm
 import reframe.utility.sanity as sn
 
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "mixins"))
+from build_cache import BuildCacheMixin  # noqa: E402
+from packing import JobPackingMixin  # noqa: E402
+
 
 @rfm.simple_test
-class MpiInitTest(rfm.RegressionTest):
+class MpiInitTest(rfm.RegressionTest, JobPackingMixin, BuildCacheMixin):
     required_thread = parameter(["single", "funneled", "serialized", "multiple"])
     """This test checks the value returned by calling MPI_Init_thread.
 
@@ -83,7 +90,7 @@ class MpiInitTest(rfm.RegressionTest):
 
 
 @rfm.simple_test
-class MpiHelloTest(rfm.RegressionTest):
+class MpiHelloTest(rfm.RegressionTest, JobPackingMixin):
     def __init__(self):
         self.valid_systems = ["cyclone:cpu"]
         self.valid_prog_environs = ["PrgEnv-gnu-nocuda", "PrgEnv-gnu", "PrgEnv-intel"]
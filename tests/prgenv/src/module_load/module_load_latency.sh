@@ -0,0 +1,56 @@
+#!/bin/bash -l
+#
+# Times the activation of a programming environment in a fresh login shell.
+#
+# Usage: module_load_latency.sh NUM_WARM COMPILER MODULE...
+#
+# Prints the times in ns of the first load of the modules, the average of
+# NUM_WARM more loads after a purge, three spider searches for the first
+# module (the first one, a repeat and one without the spider cache) and the
+# first and second invocation of the compiler.
+
+num_warm=$1
+compiler=$2
+shift 2
+
+elapsed() {
+    echo "$1 (ns): $(($(date +%s%N) - $2))"
+}
+
+module --force purge >/dev/null 2>&1
+
+t0=$(date +%s%N)
+module load "$@" || exit 1
+elapsed "Cold module load time" $t0
+
+total=0
+for _ in $(seq $num_warm); do
+    module --force purge >/dev/null 2>&1
+    t0=$(date +%s%N)
+    module load "$@" || exit 1
+    total=$((total + $(date +%s%N) - t0))
+done
+echo "Warm module load time (ns): $((total / num_warm))"
+
+t0=$(date +%s%N)
+module --terse spider "$1" >/dev/null 2>&1
+elapsed "First spider time" $t0
+
+t0=$(date +%s%N)
+module --terse spider "$1" >/dev/null 2>&1
+elapsed "Spider time" $t0
+
+t0=$(date +%s%N)
+module --ignore_cache --terse spider "$1" >/dev/null 2>&1
+elapsed "Uncached spider time" $t0
+
+echo "Compiler: $(command -v $compiler)"
+t0=$(date +%s%N)
+$compiler --version >/dev/null 2>&1 || exit 1
+elapsed "First compiler invocation time" $t0
+
+t0=$(date +%s%N)
+$compiler --version >/dev/null 2>&1 || exit 1
+elapsed "Compiler invocation time" $t0
+
+echo "Loaded modules: $*"
@@ -0,0 +1,242 @@
+#!/usr/bin/env python
+"""Throughput of the log handlers of config/cyclone.py.
+
+Logs the same records through the logging configuration of cyclone.py and
+through the previous one, the file handlers of reframe.log and reframe.out
+and the filelog perflog of a pipe-delimited line per performance variable.
+The records are made by ReFrame's logger adapter of a test, a debug2
+message and the performance variables, and then handed to the handlers of
+each configuration, the performance variables after every DEBUG_PER_PERF
+debug messages. The adapter itself is left out: it takes far longer than
+the handlers, mostly for the deprecation warning of the loggable variables
+attribute that it reads for every record.
+
+For every configuration it prints the time of the logging calls, which
+ReFrame's main loop waits for, the time until the buffered records are
+written and the CPU time of the process, with the background threads.
+
+Usage:
+  python log_handler_bench.py [--records 200000] [--perf-vars 4]
+"""
+
+import argparse
+import copy
+import importlib.util
+import logging
+import os
+import sys
+import tempfile
+import time
+import types
+
+import reframe as rfm
+import reframe.core.logging as rlog
+from reframe.core import config, runtime
+from reframe.core.builtins import parameter, performance_function
+
+config_dir = os.path.normpath(
+    os.path.join(os.path.dirname(__file__), "..", "..", "config")
+)
+
+# The logging of config/cyclone.py before config/buffered_logging.py
+PREVIOUS_LOGGING = {
+    "perflog_compat": True,
+    "handlers": [
+        {
+            "type": "file",
+            "name": "reframe.log",
+            "level": "debug2",
+            "format": "[%(asctime)s] %(levelname)s: %(check_info)s: %(message)s",
+            "append": False,
+        },
+        {
+            "type": "file",
+            "name": "reframe.out",
+            "level": "info",
+            "format": "%(message)s",
+            "append": False,
+        },
+    ],
+    "handlers_perflog": [
+        {
+            "type": "filelog",
+            "prefix": "%(check_system)s/%(check_partition)s",
+            "level": "info",
+            "format": "%(check_job_completion_time)s|reframe %(version)s|%(check_info)s|jobid=%(check_jobid)s|num_tasks=%(check_num_tasks)s|%(check_perf_var)s=%(check_perf_value)s|ref=%(check_perf_ref)s (l=%(check_perf_lower_thres)s, u=%(check_perf_upper_thres)s)|%(check_perf_unit)s",  # noqa: E501
+            "datefmt": "%FT%T%:z",
+            "append": True,
+        },
+    ],
+}
+
+# Debug messages of a test between two performance records of it
+DEBUG_PER_PERF = 50
+
+
+class LogHandlerBenchTest(rfm.RunOnlyRegressionTest):
+    size = parameter([1, 2, 4, 8])
+    valid_systems = ["*"]
+    valid_prog_environs = ["*"]
+
+    @performance_function("MB/s")
+    def bandwidth(self):
+        return 0.0
+
+
+def load_cyclone_configuration():
+    spec = importlib.util.spec_from_file_location(
+        "cyclone_config", os.path.join(config_dir, "cyclone.py")
+    )
+    cyclone = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(cyclone)
+    return cyclone.site_configuration
+
+
+def write_config(site_configuration, logging_config, workdir):
+    """Write a configuration with the given logging to workdir, return its
+    loaded site configuration."""
+
+    site_configuration = copy.deepcopy(site_configuration)
+    system = site_configuration["systems"][0]
+    system["hostnames"] = [".*"]
+    system["modules_system"] = "nomod"
+    system["prefix"] = workdir
+    logging_config = copy.deepcopy(logging_config)
+
+    # Leave the stream handler out, the terminal is not measured
+    logging_config["handlers"] = [
+        handler for handler in logging_config["handlers"] if handler["type"] != "stream"
+    ]
+    for handler in logging_config["handlers"]:
+        handler["name"] = os.path.join(workdir, handler["name"])
+    site_configuration["logging"] = [logging_config]
+    path = os.path.join(workdir, "settings.py")
+    with open(path, "w") as fp:
+        fp.write(f"site_configuration = {site_configuration!r}\n")
+
+    site_config = config.load_config(path)
+    site_config.select_subconfig(f"{system['name']}:{system['partitions'][0]['name']}")
+    return site_config
+
+
+def make_checks(num_perf_vars):
+    checks = []
+    for variant in range(LogHandlerBenchTest.num_variants):
+        check = LogHandlerBenchTest(variant_num=variant)
+        check._perfvalues = {
+            f"cyclone:login:bandwidth{i}": (
+                1000.0 + i,
+                1000.0,
+                -0.1,
+                None,
+                "MB/s",
+                "pass",
+            )
+            for i in range(num_perf_vars)
+        }
+        checks.append(check)
+
+    return checks
+
+
+class RecordCollector(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def make_records(check, multiline):
+    """Return a debug record and the performance records of a test."""
+
+    collector = RecordCollector()
+    logger = rlog.Logger("collector")
+    logger.addHandler(collector)
+    adapter = rlog.LoggerAdapter(logger, check)
+    adapter.debug2("a debug message of the benchmark")
+    debug_record = collector.records.pop()
+    task = types.SimpleNamespace(
+        testcase=(
+            check,
+            types.SimpleNamespace(name="login"),
+            types.SimpleNamespace(name="builtin"),
+        ),
+        result="pass",
+        succeeded=True,
+    )
+    adapter.log_result(rlog.INFO, task, multiline=multiline)
+    return debug_record, collector.records
+
+
+def run(site_config, checks, num_records):
+    """Log num_records debug records, return (logging calls, drain, CPU) time."""
+
+    rlog.configure_logging(site_config)
+    multiline = site_config.get("logging/0/perflog_compat")
+    records = [make_records(check, multiline) for check in checks]
+    logger = rlog.getlogger().logger
+    perflogger = rlog.getperflogger(None).logger
+
+    cpu0 = time.process_time()
+    t0 = time.perf_counter()
+    for i in range(num_records):
+        debug_record, perf_records = records[i % len(records)]
+        logger.handle(debug_record)
+        if i % DEBUG_PER_PERF == 0:
+            for record in perf_records:
+                perflogger.handle(record)
+
+    t1 = time.perf_counter()
+    rlog.shutdown()
+    t2 = time.perf_counter()
+    return t1 - t0, t2 - t1, time.process_time() - cpu0
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--records", type=int, default=200000, help="debug records to log"
+    )
+    parser.add_argument(
+        "--perf-vars",
+        type=int,
+        default=4,
+        help="performance variables of a performance record",
+    )
+    parser.add_argument(
+        "--workdir", help="directory of the logs (default: a temporary one)"
+    )
+    args = parser.parse_args()
+
+    cyclone = load_cyclone_configuration()
+    configurations = (
+        ("previous", PREVIOUS_LOGGING),
+        ("cyclone.py", cyclone["logging"][0]),
+    )
+    with tempfile.TemporaryDirectory(dir=args.workdir) as workdir:
+        checks = None
+        print("configuration|records|calls (s)|drain (s)|CPU (s)|records/s")
+        for name, logging_config in configurations:
+            logdir = os.path.join(workdir, name)
+            os.makedirs(logdir)
+            site_config = write_config(cyclone, logging_config, logdir)
+            if checks is None:
+                runtime.init_runtime(site_config)
+                checks = make_checks(args.perf_vars)
+
+            calls, drain, cpu = run(site_config, checks, args.records)
+            num_perf = len(range(0, args.records, DEBUG_PER_PERF))
+            num_records = args.records + num_perf * args.perf_vars
+            print(
+                f"{name}|{num_records}|{calls:.3f}|{drain:.3f}|{cpu:.3f}"
+                f"|{num_records / (calls + drain):.0f}"
+            )
+            sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+"""Calibrate the test references from the perflog history.
+
+For every check, parameter set, system:partition, environment and
+performance variable the last --last good records of a perflog_db.py
+database are reduced to a robust reference: the median of the values,
+with thresholds of --mad-scale scaled median absolute deviations (at least
+--min-threshold of the median). A record is good if it met the reference it
+ran with. The thresholds keep the sides of the original ones, a reference
+without an upper threshold stays without one.
+
+The references are written to a JSON file, by default the
+config/references.json that CalibratedReferenceMixin loads:
+
+  {check: {params: {environ: {"system:partition": {perf_var:
+      [value, lower, upper, unit]}}}}}
+
+where params is the parameter part of the test's display name, e.g.
+"%node_id=cn02", or "" for tests without parameters.
+
+Usage:
+  python perflog_calibrate.py --db perflogs.db [--last 20] [--days N]
+      [--check NAME] [--output ../../config/references.json]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+import perflog_db
+
+COLUMNS = (
+    "check_name",
+    "params",
+    "system",
+    "partition",
+    "environ",
+    "perf_var",
+    "value",
+    "ref",
+    "lower",
+    "upper",
+    "unit",
+)
+
+# Scales the median absolute deviation to the standard deviation of a
+# normal distribution
+MAD_TO_STD = 1.4826
+
+default_output = os.path.join(
+    os.path.dirname(__file__), "..", "..", "config", "references.json"
+)
+
+
+def is_good(value, ref, lower, upper):
+    """Whether a value met the reference it ran with."""
+    if not ref:
+        return True
+
+    if lower is not None and value < ref + abs(ref) * lower:
+        return False
+
+    if upper is not None and value > ref + abs(ref) * upper:
+        return False
+
+    return True
+
+
+def calibrate(records, last=20, min_records=5, mad_scale=3.0, min_threshold=0.02):
+    """Return the calibrated references of records sorted by time."""
+
+    series = {}
+    for (
+        check,
+        params,
+        system,
+        partition,
+        environ,
+        perf_var,
+        value,
+        ref,
+        lower,
+        upper,
+        unit,
+    ) in records:
+        if value is None or not is_good(value, ref, lower, upper):
+            continue
+
+        key = (check, params, environ, f"{system}:{partition}", perf_var)
+        series.setdefault(key, []).append((value, lower, upper, unit))
+
+    references = {}
+    for (check, params, environ, partition, perf_var), values in series.items():
+        values = values[-last:]
+        if len(values) < min_records:
+            continue
+
+        x = np.array([value for value, *_ in values])
+        median = float(np.median(x))
+        mad = float(np.median(np.abs(x - median)))
+        threshold = min_threshold
+        if median != 0:
+            threshold = max(mad_scale * MAD_TO_STD * mad / abs(median), min_threshold)
+
+        # The latest record has the current reference thresholds
+        _, lower, upper, unit = values[-1]
+        if lower is None and upper is None:
+            lower = upper = 0
+
+        references.setdefault(check, {}).setdefault(params, {}).setdefault(
+            environ, {}
+        ).setdefault(partition, {})[perf_var] = [
+            median,
+            None if lower is None else -round(threshold, 4),
+            None if upper is None else round(threshold, 4),
+            unit,
+        ]
+
+    return references
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--db", required=True, help="perflog_db.py database")
+    parser.add_argument("--check", help="only calibrate this test")
+    parser.add_argument("--days", type=float, help="only the last DAYS days")
+    parser.add_argument(
+        "--last", type=int, default=20, help="good records per reference"
+    )
+    parser.add_argument(
+        "--min-records",
+        type=int,
+        default=5,
+        help="fewer good records leave a reference uncalibrated",
+    )
+    parser.add_argument(
+        "--mad-scale",
+        type=float,
+        default=3.0,
+        help="thresholds in standard deviations estimated from the MAD",
+    )
+    parser.add_argument(
+        "--min-threshold",
+        type=float,
+        default=0.02,
+        help="minimum relative threshold",
+    )
+    parser.add_argument(
+        "--output", default=default_output, help="reference file to write"
+    )
+    args = parser.parse_args()
+
+    since = None
+    if args.days is not None:
+        since = time.time() - args.days * 86400
+
+    records = perflog_db.query(
+        perflog_db.connect(args.db), check=args.check, since=since, columns=COLUMNS
+    )
+    references = calibrate(
+        records, args.last, args.min_records, args.mad_scale, args.min_threshold
+    )
+    with open(args.output, "w") as fp:
+        json.dump(references, fp, indent=2, sort_keys=True)
+        fp.write("\n")
+
+    num_references = sum(
+        len(variables)
+        for params in references.values()
+        for environs in params.values()
+        for partitions in environs.values()
+        for variables in partitions.values()
+    )
+    print(
+        f"wrote {num_references} references of {len(references)} checks "
+        f"to {args.output}",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
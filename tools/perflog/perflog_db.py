@@ -0,0 +1,368 @@
+#!/usr/bin/env python
+"""Incremental SQLite store of the ReFrame filelog perflogs.
+
+The filelog handler of config/cyclone.py appends one pipe-delimited line
+per performance variable to a file per check, e.g.
+
+  2023-05-02T10:11:12+03:00|reframe 4.2.0|StreamTestCycloneCPU
+  %node_id=cn02 /5a8f0c1e @cyclone:cpu+PrgEnv-gnu-nocuda|jobid=123|
+  num_tasks=1|triad=79300.1|ref=79300 (l=-0.05, u=None)|MB/s
+
+(one line in the files). The jsonlines handler of config/buffered_logging.py
+writes the same records as JSON objects to a .jsonl file per check, which
+are loaded without parsing the check info. A .jsonl file next to the .log
+file of the same check is skipped, the .log file has the same records and
+the older ones. The ingest command scans a perflog directory, reads every
+file from the byte offset it stopped at the last time and stores the new
+records in an indexed SQLite database. The query command
+then selects records without touching the perflogs.
+
+Usage:
+  python perflog_db.py ingest PERFLOG_DIR [--db perflogs.db]
+  python perflog_db.py query [--db perflogs.db] [--check NAME]
+      [--partition NAME] [--perf-var NAME] [--days N]
+"""
+
+import argparse
+import datetime
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    time REAL NOT NULL,
+    check_name TEXT NOT NULL,
+    params TEXT NOT NULL,
+    hashcode TEXT,
+    system TEXT,
+    partition TEXT,
+    environ TEXT,
+    node TEXT,
+    jobid TEXT,
+    num_tasks INTEGER,
+    perf_var TEXT NOT NULL,
+    value REAL,
+    ref REAL,
+    lower REAL,
+    upper REAL,
+    unit TEXT,
+    reframe_version TEXT
+);
+CREATE INDEX IF NOT EXISTS records_check_idx
+    ON records (check_name, partition, perf_var, time);
+CREATE INDEX IF NOT EXISTS records_var_idx ON records (perf_var, partition, time);
+CREATE INDEX IF NOT EXISTS records_time_idx ON records (time);
+CREATE INDEX IF NOT EXISTS records_jobid_idx ON records (jobid);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    inode INTEGER NOT NULL,
+    offset INTEGER NOT NULL
+);
+"""
+
+# The columns of a record, in the order of parse_line()'s tuples
+COLUMNS = (
+    "time",
+    "check_name",
+    "params",
+    "hashcode",
+    "system",
+    "partition",
+    "environ",
+    "node",
+    "jobid",
+    "num_tasks",
+    "perf_var",
+    "value",
+    "ref",
+    "lower",
+    "upper",
+    "unit",
+    "reframe_version",
+)
+
+# "<display name> /<hash> @<system>:<partition>+<environ>", the display
+# name is the test name followed by " %<param>=<value>" for every parameter
+check_info_re = re.compile(
+    r"(?P<name>\S+)(?P<params>.*?) /(?P<hashcode>\w+)"
+    r"(?: @(?P<system>[^:+\s]+):(?P<partition>[^+\s]+))?(?:\+(?P<environ>\S+))?$"
+)
+param_re = re.compile(r" %(?P<key>[\w.]+)=(?P<value>\S*)")
+ref_re = re.compile(r"ref=(?P<ref>\S+) \(l=(?P<lower>[^,]+), u=(?P<upper>[^)]+)\)")
+
+# The parameters that name the node a test ran on
+NODE_PARAMS = ("node_id", "node")
+
+
+def _float(s):
+    try:
+        return float(s)
+    except ValueError:
+        return None
+
+
+def _int(s):
+    try:
+        return int(s)
+    except ValueError:
+        return None
+
+
+def parse_time(s):
+    """Return the POSIX timestamp of a %FT%T%:z perflog time."""
+    return datetime.datetime.fromisoformat(s).timestamp()
+
+
+def parse_json_line(line):
+    """Return the record tuple (see COLUMNS) of a JSON-lines perflog line."""
+
+    try:
+        record = json.loads(line)
+        params = record["params"]
+        record["params"] = " ".join(f"%{key}={value}" for key, value in params.items())
+        record["node"] = next(
+            (params[key] for key in NODE_PARAMS if key in params), None
+        )
+        return tuple(record.get(column) for column in COLUMNS)
+    except (KeyError, AttributeError, TypeError) as err:
+        raise ValueError(f"bad record: {line!r}") from err
+
+
+def parse_line(line):
+    """Return the record tuple (see COLUMNS) of a perflog line.
+
+    Raises ValueError if the line is not a perflog record.
+    """
+
+    if line.startswith("{"):
+        return parse_json_line(line)
+
+    fields = line.rstrip("\n").split("|")
+    if len(fields) < 6:
+        raise ValueError(f"too few fields: {line!r}")
+
+    check_info = check_info_re.match(fields[2])
+    if check_info is None:
+        raise ValueError(f"bad check info: {fields[2]!r}")
+
+    params = dict(param_re.findall(check_info["params"]))
+    node = next((params[key] for key in NODE_PARAMS if key in params), None)
+
+    # Extra key=value fields (jobid, num_tasks) sit between the check info
+    # and the performance value
+    extras = dict(field.partition("=")[::2] for field in fields[3:-3])
+    perf_var, _, value = fields[-3].partition("=")
+    ref = ref_re.match(fields[-2])
+    if ref is None:
+        raise ValueError(f"bad reference: {fields[-2]!r}")
+
+    return (
+        parse_time(fields[0]),
+        check_info["name"],
+        check_info["params"].strip(),
+        check_info["hashcode"],
+        check_info["system"],
+        check_info["partition"],
+        check_info["environ"],
+        node,
+        extras.get("jobid"),
+        _int(extras.get("num_tasks", "")),
+        perf_var,
+        _float(value),
+        _float(ref["ref"]),
+        _float(ref["lower"]),
+        _float(ref["upper"]),
+        fields[-1],
+        fields[1].replace("reframe ", "", 1),
+    )
+
+
+def connect(db_path):
+    """Open the database, creating its tables and indexes if needed."""
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def perflog_files(perflog_dir):
+    for dirpath, _, filenames in os.walk(perflog_dir):
+        for filename in sorted(filenames):
+            # Both perflog handlers write the same records
+            base, ext = os.path.splitext(filename)
+            if ext == ".log" or (ext == ".jsonl" and f"{base}.log" not in filenames):
+                yield os.path.join(dirpath, filename)
+
+
+def ingest_file(conn, path):
+    """Store the records appended to a perflog since the last ingestion.
+
+    Only complete lines are consumed, a line that is still being written is
+    read on the next ingestion. A file that was replaced or truncated is
+    read again from its start. Returns (records, bad lines).
+    """
+
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    row = conn.execute(
+        "SELECT inode, offset FROM files WHERE path = ?", (path,)
+    ).fetchone()
+    offset = 0
+    if row is not None and row[0] == stat.st_ino and row[1] <= stat.st_size:
+        offset = row[1]
+
+    if offset == stat.st_size:
+        return 0, 0
+
+    with open(path, "rb") as fp:
+        fp.seek(offset)
+        data = fp.read()
+
+    end = data.rfind(b"\n") + 1
+    records = []
+    num_bad = 0
+    for line in data[:end].decode(errors="replace").splitlines():
+        if not line.strip():
+            continue
+
+        try:
+            records.append(parse_line(line))
+        except ValueError:
+            num_bad += 1
+
+    with conn:
+        conn.executemany(
+            f"INSERT INTO records ({', '.join(COLUMNS)}) "
+            f"VALUES ({', '.join('?' * len(COLUMNS))})",
+            records,
+        )
+        conn.execute(
+            "INSERT OR REPLACE INTO files (path, inode, offset) VALUES (?, ?, ?)",
+            (path, stat.st_ino, offset + end),
+        )
+
+    return len(records), num_bad
+
+
+def ingest(conn, perflog_dir):
+    """Ingest every perflog under a directory, return (records, bad lines)."""
+    num_records = num_bad = 0
+    for path in perflog_files(perflog_dir):
+        records, bad = ingest_file(conn, path)
+        num_records += records
+        num_bad += bad
+
+    return num_records, num_bad
+
+
+def query(
+    conn,
+    check=None,
+    partition=None,
+    perf_var=None,
+    environ=None,
+    since=None,
+    columns=COLUMNS,
+):
+    """Return the matching records, oldest first.
+
+    Every argument left as None matches all records, since is a POSIX
+    timestamp.
+    """
+
+    conditions = []
+    args = []
+    for column, value in (
+        ("check_name", check),
+        ("partition", partition),
+        ("perf_var", perf_var),
+        ("environ", environ),
+    ):
+        if value is not None:
+            conditions.append(f"{column} = ?")
+            args.append(value)
+
+    if since is not None:
+        conditions.append("time >= ?")
+        args.append(since)
+
+    sql = f"SELECT {', '.join(columns)} FROM records"
+    if conditions:
+        sql += f" WHERE {' AND '.join(conditions)}"
+
+    sql += " ORDER BY time"
+    return conn.execute(sql, args).fetchall()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    ingest_parser = subparsers.add_parser(
+        "ingest", help="store the new records of the perflogs"
+    )
+    ingest_parser.add_argument("perflog_dir", help="ReFrame's perflog directory")
+    ingest_parser.add_argument("--db", default="perflogs.db", help="database file")
+
+    query_parser = subparsers.add_parser("query", help="print stored records")
+    query_parser.add_argument("--db", default="perflogs.db", help="database file")
+    query_parser.add_argument("--check", help="test name, without parameters")
+    query_parser.add_argument("--partition", help="partition name, e.g. cpu")
+    query_parser.add_argument("--perf-var", help="performance variable, e.g. triad")
+    query_parser.add_argument("--environ", help="programming environment")
+    query_parser.add_argument(
+        "--days", type=float, help="only records of the last DAYS days"
+    )
+    args = parser.parse_args()
+
+    conn = connect(args.db)
+    if args.command == "ingest":
+        t0 = time.perf_counter()
+        num_records, num_bad = ingest(conn, args.perflog_dir)
+        dt = time.perf_counter() - t0
+        print(f"ingested {num_records} records in {dt:.2f} s", file=sys.stderr)
+        if num_bad:
+            print(f"skipped {num_bad} unparsable lines", file=sys.stderr)
+    else:
+        since = None
+        if args.days is not None:
+            since = time.time() - args.days * 86400
+
+        columns = (
+            "time",
+            "check_name",
+            "params",
+            "partition",
+            "environ",
+            "jobid",
+            "perf_var",
+            "value",
+            "unit",
+        )
+        t0 = time.perf_counter()
+        rows = query(
+            conn,
+            check=args.check,
+            partition=args.partition,
+            perf_var=args.perf_var,
+            environ=args.environ,
+            since=since,
+            columns=columns,
+        )
+        dt = time.perf_counter() - t0
+        print("|".join(columns))
+        for row in rows:
+            when = datetime.datetime.fromtimestamp(row[0]).isoformat()
+            print("|".join([when] + [str(value) for value in row[1:]]))
+
+        print(f"{len(rows)} records in {dt * 1000:.1f} ms", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,321 @@
+#!/usr/bin/env python
+"""Performance regression and change point detection over the perflogs.
+
+The records are split into series by (check, partition, node, environ,
+perf_var) and every series is sorted by time. For every record the mean of
+the WINDOW records before it (the rolling baseline) is compared with the
+mean of the WINDOW records from it on. A record starts a change when the
+difference is significant (Welch's t above --t-threshold) and large (more
+than --min-shift of the baseline), and when it is the most significant
+record within WINDOW records. All series are handled at once on
+concatenated NumPy arrays, with cumulative sums for the window means.
+
+The records come from a perflog_db.py database, straight from a perflog
+directory or from a synthetic history with known shifts.
+
+Usage:
+  python perflog_regress.py --db perflogs.db [--days N] [--window 20]
+  python perflog_regress.py --perflogs PERFLOG_DIR
+  python perflog_regress.py --synthetic 500000
+"""
+
+import argparse
+import datetime
+import random
+import sys
+import time
+
+import numpy as np
+
+import perflog_db
+
+# The columns the detection needs, in the order of the record tuples
+COLUMNS = (
+    "check_name",
+    "partition",
+    "node",
+    "environ",
+    "perf_var",
+    "time",
+    "value",
+    "jobid",
+    "lower",
+    "upper",
+)
+COLUMNS_POS = {column: pos for pos, column in enumerate(perflog_db.COLUMNS)}
+
+
+class Series:
+    """The records of all series as sorted, concatenated NumPy arrays.
+
+    keys[i] is the (check, partition, node, environ, perf_var) of series i,
+    the records of series i are the slice starts[i]:starts[i + 1] of the
+    sid, times, values and jobids arrays, oldest first.
+    higher_is_better[i] follows the reference thresholds of the series.
+    """
+
+    def __init__(self, records):
+        records = [record for record in records if record[6] is not None]
+        key_ids = {}
+        sid = np.fromiter(
+            (key_ids.setdefault(record[:5], len(key_ids)) for record in records),
+            dtype=np.int64,
+            count=len(records),
+        )
+        times = np.fromiter(
+            (record[5] for record in records), dtype=np.float64, count=len(records)
+        )
+        values = np.fromiter(
+            (record[6] for record in records), dtype=np.float64, count=len(records)
+        )
+        jobids = np.array([record[7] for record in records], dtype=object)
+
+        # Only an upper threshold means lower values are better
+        higher_is_better = np.ones(len(key_ids), dtype=bool)
+        for record in records:
+            if record[8] is None and record[9] is not None:
+                higher_is_better[key_ids[record[:5]]] = False
+
+        order = np.lexsort((times, sid))
+        self.keys = list(key_ids)
+        self.sid = sid[order]
+        self.times = times[order]
+        self.values = values[order]
+        self.jobids = jobids[order]
+        self.higher_is_better = higher_is_better
+        self.starts = np.searchsorted(self.sid, np.arange(len(self.keys) + 1))
+
+    def __len__(self):
+        return len(self.values)
+
+
+def sliding_max(a, before, after):
+    """Maximum of a[i - before:i + after] for every i, padding with -inf."""
+    padded = np.concatenate(
+        [np.full(before, -np.inf), a, np.full(max(after - 1, 0), -np.inf)]
+    )
+    windows = np.lib.stride_tricks.sliding_window_view(padded, before + max(after, 1))
+    if after == 0:
+        windows = windows[:, :-1]
+
+    return windows.max(axis=1)
+
+
+def detect_changes(series, window=20, t_threshold=6.0, min_shift=0.02):
+    """Return the indices of the records that start a change, and their
+    baseline (mean of the window before), new level (mean of the window
+    after) and t score.
+    """
+
+    n = len(series)
+    if n == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0), np.empty(0), np.empty(0)
+
+    # Center every series on its mean, so that the sums of squares do not
+    # lose the variance to rounding
+    counts = np.diff(series.starts)
+    means = np.add.reduceat(series.values, series.starts[:-1]) / np.maximum(counts, 1)
+    x = series.values - means[series.sid]
+
+    cs = np.concatenate([[0.0], np.cumsum(x)])
+    cs2 = np.concatenate([[0.0], np.cumsum(x * x)])
+
+    # Both windows have to lie within the series of the record
+    idx = np.arange(n)
+    seg_start = series.starts[series.sid]
+    seg_end = series.starts[series.sid + 1]
+    valid = (idx - window >= seg_start) & (idx + window <= seg_end)
+    lo = np.clip(idx - window, 0, n)
+    hi = np.clip(idx + window, 0, n)
+
+    mean_before = (cs[idx] - cs[lo]) / window
+    mean_after = (cs[hi] - cs[idx]) / window
+    var_before = np.maximum((cs2[idx] - cs2[lo]) / window - mean_before**2, 0)
+    var_after = np.maximum((cs2[hi] - cs2[idx]) / window - mean_after**2, 0)
+    shift = mean_after - mean_before
+    scale = np.sqrt((var_before + var_after) / window)
+    # A shift between two noiseless levels is infinitely significant
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = np.where(shift == 0, 0.0, np.abs(shift) / scale)
+
+    baseline = mean_before + means[series.sid]
+    level = mean_after + means[series.sid]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rel_shift = np.abs(shift) / np.abs(baseline)
+
+    score = np.where(valid, t, 0.0)
+    # The first record of a run of equally significant records starts the
+    # change; valid records of different series are over 2 * window apart
+    is_peak = (score > sliding_max(score, window, 0)) & (
+        score >= sliding_max(score, 0, window + 1)
+    )
+    changes = np.flatnonzero(
+        valid & is_peak & (score > t_threshold) & (rel_shift > min_shift)
+    )
+    return changes, baseline[changes], level[changes], t[changes]
+
+
+def synthetic_records(num_records, num_series=100, shifts_per_series=1, seed=42):
+    """Return a synthetic history with known shifts and the shifts.
+
+    Every series is noisy around its own level (1% standard deviation) and
+    shifts by 5-15% up or down at random records. The shifts are returned as
+    (key, time of the first shifted record, relative shift).
+    """
+
+    rng = np.random.default_rng(seed)
+    per_series = num_records // num_series
+    t0 = datetime.datetime(2023, 1, 1).timestamp()
+    records = []
+    shifts = []
+    for s in range(num_series):
+        key = (
+            f"Check{s % 7}",
+            random.Random(s).choice(["cpu", "gpu"]),
+            f"cn{s:02d}",
+            "PrgEnv-gnu",
+            "triad",
+        )
+        level = np.full(per_series, 1000.0 * (1 + s % 10))
+        for _ in range(shifts_per_series):
+            at = int(rng.integers(per_series // 4, 3 * per_series // 4))
+            rel = rng.uniform(0.05, 0.15) * rng.choice([-1, 1])
+            level[at:] *= 1 + rel
+            shifts.append((key, t0 + 3600.0 * at, rel))
+
+        values = level * (1 + 0.01 * rng.standard_normal(per_series))
+        for i, value in enumerate(values):
+            records.append(
+                key + (t0 + 3600.0 * i, float(value), f"{s}-{i}", -0.05, None)
+            )
+
+    return records, shifts
+
+
+def load_perflogs(perflog_dir, check=None, partition=None, perf_var=None, since=None):
+    records = []
+    positions = [COLUMNS_POS[column] for column in COLUMNS]
+    for path in perflog_db.perflog_files(perflog_dir):
+        with open(path) as fp:
+            for line in fp:
+                try:
+                    record = perflog_db.parse_line(line)
+                except ValueError:
+                    continue
+
+                record = tuple(record[pos] for pos in positions)
+                if (
+                    (check is None or record[0] == check)
+                    and (partition is None or record[1] == partition)
+                    and (perf_var is None or record[4] == perf_var)
+                    and (since is None or record[5] >= since)
+                ):
+                    records.append(record)
+
+    return records
+
+
+def report(series, changes, baseline, level, t):
+    print("check|partition|node|environ|perf_var|time|jobid|baseline|new|change|t")
+    for i, before, after, score in zip(changes, baseline, level, t):
+        sid = series.sid[i]
+        rel = (after - before) / before
+        worse = (rel < 0) == series.higher_is_better[sid]
+        when = datetime.datetime.fromtimestamp(series.times[i]).isoformat()
+        print(
+            "|".join(str(field) for field in series.keys[sid])
+            + f"|{when}|{series.jobids[i]}|{before:.6g}|{after:.6g}"
+            f"|{100 * rel:+.1f}% {'regression' if worse else 'improvement'}"
+            f"|{score:.1f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--db", help="perflog_db.py database")
+    source.add_argument("--perflogs", help="ReFrame's perflog directory")
+    source.add_argument(
+        "--synthetic",
+        type=int,
+        metavar="N",
+        help="detect the shifts of N synthetic records",
+    )
+    parser.add_argument("--check", help="only this test")
+    parser.add_argument("--partition", help="only this partition")
+    parser.add_argument("--perf-var", help="only this performance variable")
+    parser.add_argument("--days", type=float, help="only the last DAYS days")
+    parser.add_argument(
+        "--window",
+        type=int,
+        default=20,
+        help="records before and after a change that are compared",
+    )
+    parser.add_argument(
+        "--t-threshold",
+        type=float,
+        default=6.0,
+        help="minimum significance of a change (Welch's t)",
+    )
+    parser.add_argument(
+        "--min-shift",
+        type=float,
+        default=0.02,
+        help="minimum change relative to the baseline",
+    )
+    args = parser.parse_args()
+
+    since = None
+    if args.days is not None:
+        since = time.time() - args.days * 86400
+
+    t0 = time.perf_counter()
+    if args.db is not None:
+        records = perflog_db.query(
+            perflog_db.connect(args.db),
+            check=args.check,
+            partition=args.partition,
+            perf_var=args.perf_var,
+            since=since,
+            columns=COLUMNS,
+        )
+    elif args.perflogs is not None:
+        records = load_perflogs(
+            args.perflogs, args.check, args.partition, args.perf_var, since
+        )
+    else:
+        records, shifts = synthetic_records(args.synthetic)
+
+    t1 = time.perf_counter()
+    series = Series(records)
+    changes, baseline, level, t = detect_changes(
+        series, args.window, args.t_threshold, args.min_shift
+    )
+    t2 = time.perf_counter()
+    report(series, changes, baseline, level, t)
+    print(
+        f"{len(changes)} changes in {len(series)} records of "
+        f"{len(series.keys)} series (load {t1 - t0:.2f} s, detect {t2 - t1:.2f} s)",
+        file=sys.stderr,
+    )
+
+    if args.synthetic is not None:
+        # A change counts if it starts at most two records off the shift
+        found = {}
+        for i in changes:
+            found.setdefault(series.keys[series.sid[i]], []).append(series.times[i])
+        detected = sum(
+            any(abs(when - at) <= 2 * 3600 for when in found.get(key, []))
+            for key, at, _ in shifts
+        )
+        print(
+            f"{detected} of {len(shifts)} synthetic shifts detected, "
+            f"{len(changes) - detected} other changes",
+            file=sys.stderr,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+"""Record the hardware topology of the nodes of a partition.
+
+Run on a node of the partition, e.g.
+
+  srun -p cpu -A p168 -N 1 --exclusive \
+      python tools/topology/probe_topology.py --partition cpu
+
+The processor info (sockets, cores, hardware threads, NUMA nodes and
+caches) is detected the way ReFrame auto-detects it, the SIMD width from the
+instruction set extensions of the CPU. Both are written to
+config/topology/<system>-<partition>.json, which config/cyclone.py loads
+into the processor info and the simd_width extra of the partition. The tests
+size their tasks and threads from it with TopologyMixin.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+from reframe.utility.cpuinfo import cpuinfo
+
+# Widest vector registers of an instruction set extension, in bits
+SIMD_WIDTHS = (
+    ("avx512f", 512),
+    ("avx2", 256),
+    ("avx", 256),
+    ("sve", 512),
+    ("sse2", 128),
+    ("asimd", 128),
+    ("neon", 128),
+)
+
+default_output_dir = os.path.normpath(
+    os.path.join(os.path.dirname(__file__), "..", "..", "config", "topology")
+)
+
+
+def simd_width(cpuinfo_path="/proc/cpuinfo"):
+    """Return the SIMD width in bits of the CPU, None if unknown."""
+
+    flags = set()
+    with open(cpuinfo_path) as fp:
+        for line in fp:
+            key, _, value = line.partition(":")
+            if key.strip() in ("flags", "Features"):
+                flags.update(value.split())
+
+    return next((width for flag, width in SIMD_WIDTHS if flag in flags), None)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--system", default="cyclone", help="system name")
+    parser.add_argument("--partition", required=True, help="partition name")
+    parser.add_argument(
+        "--output-dir", default=default_output_dir, help="topology directory"
+    )
+    args = parser.parse_args()
+
+    topology = {"processor": cpuinfo(), "simd_width": simd_width()}
+    output = os.path.join(args.output_dir, f"{args.system}-{args.partition}.json")
+    os.makedirs(args.output_dir, exist_ok=True)
+    with open(output, "w") as fp:
+        json.dump(topology, fp, indent=2)
+        fp.write("\n")
+
+    processor = topology["processor"]
+    print(
+        f"{processor.get('num_sockets')} sockets, {processor.get('num_cpus')} cpus, "
+        f"{len(processor.get('topology', {}).get('numa_nodes', []))} NUMA nodes, "
+        f"{topology['simd_width']}-bit SIMD: wrote {output}",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()